@@ -76,13 +76,14 @@ if st.session_state.active_page == "Home":
 # -----------------------------
 elif st.session_state.active_page == "download":
     st.header("📥 Download Invoices")
-    st.caption("Choose the supplier and automatically download this week's invoices. PDFs are saved to your local Downloads folder.")
+    st.caption("Choose the supplier and automatically download this week's invoices. PDFs are saved to Downloads/<SUPPLIER>; ALL downloads every supplier at once.")
 
     supplier_map = {
         "LION": "lion",
         "CUB": "cub",
         "COKE": "coke",
         "ALM": "alm",
+        "ALL": "all",
     }
 
     supplier_label = st.selectbox("Supplier", list(supplier_map.keys()), index=0, key="dl_supplier")
@@ -96,10 +97,15 @@ elif st.session_state.active_page == "download":
                 capture_output=True,
                 text=True
             )
+        summary = result.stdout[result.stdout.rfind("📋"):] if "📋" in result.stdout else result.stdout
         if result.returncode == 0:
-            st.success("✅ Download complete. Check your **Downloads** folder.")
+            st.success("✅ Download complete. Check your **Downloads/<SUPPLIER>** folders.")
+            if summary.strip():
+                st.code(summary)
         else:
             st.error("❌ Error during download.")
+            if summary.strip():
+                st.code(summary)
             if result.stderr.strip():
                 st.code(result.stderr)
 
@@ -182,6 +188,7 @@ elif st.session_state.active_page == "delivery":
     all_suppliers_ready = all(any(pdf_dir.glob(f"invoice_{s}_*.pdf")) for s in suppliers)
 
     if all_suppliers_ready:
+        force_reparse = st.checkbox("🔁 Force full re-parse (ignore cached invoices)", key="delivery_force_reparse")
         if st.button("📋 Generate Delivery Checklist"):
             # 🔒 CONGELAR uploads desde este momento para que NO se re-escriban en reruns
             st.session_state.delivery_freeze_uploads = True
@@ -192,10 +199,14 @@ elif st.session_state.active_page == "delivery":
 
             # ¿Faltan excels? -> parser
             missing = [s for s in suppliers if not any((xlsx_base / s).glob("*.xlsx"))]
-            if missing:
-                st.info(f"🔄 Missing parsed Excel files for: {', '.join(s.upper() for s in missing)}")
+            if missing or force_reparse:
+                if missing:
+                    st.info(f"🔄 Missing parsed Excel files for: {', '.join(s.upper() for s in missing)}")
+                else:
+                    st.info("🔁 Forcing a full re-parse of every invoice")
                 with st.spinner("🧾 Parsing invoices..."):
-                    p = subprocess.run([sys.executable, "scripts/1-parser.py"], capture_output=True, text=True)
+                    parser_cmd = [sys.executable, "scripts/1-parser.py"] + (["--no-cache"] if force_reparse else [])
+                    p = subprocess.run(parser_cmd, capture_output=True, text=True)
                     if p.returncode != 0:
                         st.error("❌ Error parsing invoices:"); st.code(p.stderr); st.stop()
                     st.success("✅ Invoices parsed successfully")
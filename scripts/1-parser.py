@@ -1,7 +1,82 @@
 import fitz
 import re
 import os
+import argparse
+import hashlib
+import pickle
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
+from catalog import load_catalog
+
+
+def read_pdf_pages(pdf_path):
+    """Abre el PDF una sola vez y devuelve el texto de cada página."""
+    with fitz.open(pdf_path) as doc:
+        return [page.get_text() for page in doc]
+
+
+def read_pdf_lines(pdf_path):
+    """Abre el PDF una sola vez y devuelve todas sus líneas de texto."""
+    lines = []
+    for text in read_pdf_pages(pdf_path):
+        lines.extend(text.split('\n'))
+    return lines
+
+
+def _as_lines(source):
+    # Los extractores aceptan una ruta al PDF o las líneas ya leídas
+    if isinstance(source, (list, tuple)):
+        return source
+    return read_pdf_lines(source)
+
+
+# Huellas de cada proveedor en la primera página (ABN, membrete, formato de la factura)
+SUPPLIER_FINGERPRINTS = {
+    "lion": [
+        (r"ABN\s*13\s*008\s*596\s*370", 3),
+        (r"lionco\.com", 2),
+        (r"Lion - Beer", 2),
+        (r"LINE VALUE", 1),
+    ],
+    "cub": [
+        (r"Carlton\s*&\s*United", 3),
+        (r"\bcub\.com\.au\b", 2),
+        (r"Asahi", 1),
+    ],
+    "coke": [
+        (r"Coca[- ]Cola\s+Europacific", 3),
+        (r"Coca[- ]Cola\s+Amatil", 3),
+        (r"\bccep\.com", 2),
+    ],
+    "alm": [
+        (r"Australian\s+Liquor\s+Marketers", 3),
+        (r"Metcash", 2),
+        (r"\bALM\b", 1),
+    ],
+}
+FINGERPRINT_MIN_SCORE = 3
+
+_COMPILED_FINGERPRINTS = {
+    supplier: [(re.compile(pattern, re.IGNORECASE), weight) for pattern, weight in rules]
+    for supplier, rules in SUPPLIER_FINGERPRINTS.items()
+}
+
+
+def fingerprint_supplier(first_page_text):
+    """
+    Clasifica la factura leyendo solo la primera página.
+    Devuelve el proveedor si la confianza es suficiente, o None si hay que probar todos.
+    """
+    scores = {
+        supplier: sum(weight for regex, weight in rules if regex.search(first_page_text))
+        for supplier, rules in _COMPILED_FINGERPRINTS.items()
+    }
+    ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+    best, best_score = ranked[0]
+    runner_up_score = ranked[1][1] if len(ranked) > 1 else 0
+    if best_score >= FINGERPRINT_MIN_SCORE and best_score > runner_up_score:
+        return best
+    return None
 
 
 def detect_supplier(product_codes, product_db):
@@ -18,10 +93,7 @@ def detect_supplier(product_codes, product_db):
 def extract_lion_invoice_data(pdf_path):
 
     # Leer líneas del PDF
-    doc = fitz.open(pdf_path)
-    lines = []
-    for page in doc:
-        lines.extend(page.get_text().split('\n'))
+    lines = _as_lines(pdf_path)
 
     # Buscar PO number
     po_number = next((line.strip() for line in lines if re.search(r"PO\d{8}", line)), "PO00000000")
@@ -120,10 +192,7 @@ def extract_lion_invoice_data(pdf_path):
     return df
 
 def extract_cub_invoice_data(pdf_path):
-    doc = fitz.open(pdf_path)
-    lines = []
-    for page in doc:
-        lines.extend(page.get_text().split('\n'))
+    lines = _as_lines(pdf_path)
 
     po_number = next((match.group() for line in lines if (match := re.search(r"PO\d{8}", line))), "PO00000000")
 
@@ -146,10 +215,7 @@ def extract_cub_invoice_data(pdf_path):
     return pd.DataFrame(productos, columns=["PO Number", "Product Code", "Order Qty", "Total Cost"])
 
 def extract_alm_invoice_data(pdf_path):
-    doc = fitz.open(pdf_path)
-    lines = []
-    for page in doc:
-        lines.extend(page.get_text().split('\n'))
+    lines = _as_lines(pdf_path)
 
     # Detectar PO number (formato: PO12345678)
     po_number_match = next((line for line in lines if re.match(r"PO\d{8}", line)), "PO00000000")
@@ -222,10 +288,7 @@ def extract_alm_invoice_data(pdf_path):
     return df
 
 def extract_coke_invoice_data(pdf_path):
-    doc = fitz.open(pdf_path)
-    lines = []
-    for page in doc:
-        lines.extend(page.get_text().split('\n'))
+    lines = _as_lines(pdf_path)
 
     match = next((re.search(r"PO\d{8}", line) for line in lines if "PO" in line), None)
     po_number = match.group() if match else "PO00000000"
@@ -249,14 +312,165 @@ def extract_coke_invoice_data(pdf_path):
     return pd.DataFrame(productos, columns=["PO Number", "Product Code", "Order Qty", "Total Cost"])
 
 
+EXTRACTORS = {
+    "alm": extract_alm_invoice_data,
+    "coke": extract_coke_invoice_data,
+    "cub": extract_cub_invoice_data,
+    "lion": extract_lion_invoice_data,
+}
+
+
+def _product_codes(df):
+    product_code_col = next((col for col in df.columns if col.strip().lower() == "product code"), None)
+    if not product_code_col:
+        raise ValueError("❌ No se encontró la columna 'Product Code' en el DataFrame extraído.")
+    return set(df[product_code_col].astype(str))
+
+
+def parse_invoice(pdf_path, product_db):
+    """
+    Lee el PDF una vez, detecta el proveedor por huella y ejecuta solo su extractor.
+    Si la huella no es confiable (o el extractor no devuelve productos) se prueban todos.
+    Devuelve (supplier, df) o (None, None).
+    """
+    filename = os.path.basename(pdf_path)
+    pages = read_pdf_pages(pdf_path)
+    lines = [line for text in pages for line in text.split('\n')]
+
+    # 1) Ruta rápida: huella de la primera página
+    supplier = fingerprint_supplier(pages[0] if pages else "")
+    if supplier in EXTRACTORS and supplier in product_db:
+        try:
+            df = EXTRACTORS[supplier](lines)
+            # La huella sola no alcanza: los códigos tienen que ser de ese proveedor
+            if not df.empty and detect_supplier(_product_codes(df), product_db) == supplier:
+                return supplier, df
+        except Exception as e:
+            print(f"❌ Error processing {filename} with extractor {supplier}: {e}")
+        print(f"⚠️ {filename}: fingerprint said {supplier.upper()} but the extracted codes don't confirm it, trying all extractors")
+
+    # 2) Fallback: probar todos los extractores y elegir por coincidencia de códigos
+    best_supplier = None
+    best_df = None
+    best_match_count = 0
+
+    for supplier, extractor in EXTRACTORS.items():
+        try:
+            df = extractor(lines)
+            product_codes = _product_codes(df)
+
+            match_supplier = detect_supplier(product_codes, product_db)
+
+            if match_supplier and len(product_codes & product_db[match_supplier]) > best_match_count:
+                best_supplier = match_supplier
+                best_df = df
+                best_match_count = len(product_codes & product_db[match_supplier])
+        except Exception as e:
+            print(f"❌ Error processing {filename} with extractor {supplier}: {e}")
+            continue
+
+    return best_supplier, best_df
+
+
+# --- Caché de facturas parseadas (hash del PDF + versión del parser) ---------
+# Subir PARSER_VERSION cada vez que cambie la lógica de extracción: invalida toda la caché.
+PARSER_VERSION = "2"
+CACHE_MAX_BYTES = 50 * 1024 * 1024
+
+
+class InvoiceCache:
+    """
+    Caché en disco: un pickle (supplier, df) por PDF, con clave sha256(contenido) + PARSER_VERSION.
+    Los hits actualizan el mtime del archivo; al superar CACHE_MAX_BYTES se borran los menos usados (LRU).
+    """
+
+    def __init__(self, cache_dir, max_bytes=CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key_for(pdf_path):
+        h = hashlib.sha256()
+        with open(pdf_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(chunk)
+        return f"{h.hexdigest()}-v{PARSER_VERSION}"
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".pkl")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                supplier, df = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+        os.utime(path)  # marcar como usado recientemente
+        return supplier, df
+
+    def put(self, key, supplier, df):
+        path = self._path(key)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump((supplier, df), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    def clear(self):
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".pkl"):
+                os.remove(os.path.join(self.cache_dir, name))
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".pkl"):
+                st = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((st.st_mtime, st.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.cache_dir, name))
+            total -= size
+
+
+# --- Pool de procesos (--jobs N) ---------------------------------------------
+_worker_product_db = None
+
+
+def _init_worker(product_db):
+    global _worker_product_db
+    _worker_product_db = product_db
+
+
+def _parse_job(pdf_path):
+    """Ejecuta parse_invoice en un worker y devuelve el error como texto en vez de lanzarlo."""
+    try:
+        supplier, df = parse_invoice(pdf_path, _worker_product_db)
+        return supplier, df, None
+    except Exception as e:
+        return None, None, str(e)
+
+
+def _parse_args():
+    p = argparse.ArgumentParser(description="Extract product data from the PDF invoices in PDF_invoices.")
+    p.add_argument("--jobs", type=int, default=1, help="Cantidad de procesos para parsear PDFs en paralelo (default: 1)")
+    p.add_argument("--no-cache", action="store_true", help="Ignora la caché y vuelve a parsear todos los PDFs")
+    p.add_argument("--clear-cache", action="store_true", help="Vacía la caché de facturas parseadas antes de empezar")
+    return p.parse_args()
+
+
 if __name__ == "__main__":
+    args = _parse_args()
     base_dir = os.path.dirname(__file__)
     input_base = os.path.join(base_dir, "../PDF_invoices")
     output_base = os.path.join(base_dir, "../Excel_invoices")
 
     # 1. Cargar productos por hoja desde products.xlsx
     products_path = os.path.join(base_dir, "../assets/products.xlsx")
-    xl = pd.read_excel(products_path, sheet_name=None)
+    xl = load_catalog(products_path).sheets
     product_db = {
         supplier.lower(): set(df["Product Code"].astype(str)) for supplier, df in xl.items()
     }
@@ -265,43 +479,50 @@ if __name__ == "__main__":
     for supplier in product_db:
         os.makedirs(os.path.join(output_base, supplier), exist_ok=True)
 
-    # 3. Procesar todos los PDF de la carpeta PDF_invoices
-    for filename in os.listdir(input_base):
-        if not filename.lower().endswith(".pdf"):
+    # 3. Procesar todos los PDF de la carpeta PDF_invoices (orden alfabético = salida determinística)
+    filenames = sorted(f for f in os.listdir(input_base) if f.lower().endswith(".pdf"))
+    pdf_paths = [os.path.join(input_base, f) for f in filenames]
+
+    # 4. Resolver desde la caché los PDFs que no cambiaron
+    cache = InvoiceCache(os.path.join(base_dir, "../.cache/parsed_invoices"))
+    if args.clear_cache:
+        cache.clear()
+
+    keys = [InvoiceCache.key_for(p) for p in pdf_paths]
+    results = [None] * len(pdf_paths)
+    if not args.no_cache:
+        for i, key in enumerate(keys):
+            hit = cache.get(key)
+            if hit is not None:
+                results[i] = (hit[0], hit[1], None)
+
+    pending = [i for i, r in enumerate(results) if r is None]
+    if pending:
+        print(f"🔄 Parsing {len(pending)} PDF(s), {len(pdf_paths) - len(pending)} loaded from cache")
+    pending_paths = [pdf_paths[i] for i in pending]
+
+    if args.jobs > 1 and len(pending_paths) > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs, initializer=_init_worker, initargs=(product_db,)) as pool:
+            # map() conserva el orden de entrada aunque los PDFs terminen en otro orden
+            parsed = list(pool.map(_parse_job, pending_paths))
+    else:
+        _init_worker(product_db)
+        parsed = [_parse_job(p) for p in pending_paths]
+
+    for i, result in zip(pending, parsed):
+        results[i] = result
+        supplier, df, error = result
+        # Solo se cachean las facturas reconocidas; las fallidas se reintentan la próxima vez
+        if not error and supplier and df is not None:
+            cache.put(keys[i], supplier, df)
+    cache.evict()
+
+    # 5. Escribir los Excel en el proceso principal, en el mismo orden que los PDFs
+    for filename, (best_supplier, best_df, error) in zip(filenames, results):
+        if error:
+            print(f"❌ Error reading {filename}: {error}")
             continue
 
-        pdf_path = os.path.join(input_base, filename)
-
-        # Probar todos los extractores
-        extractors = {
-            "alm": extract_alm_invoice_data,
-            "coke": extract_coke_invoice_data,
-            "cub": extract_cub_invoice_data,
-            "lion": extract_lion_invoice_data
-        }
-
-        best_supplier = None
-        best_df = None
-        best_match_count = 0
-
-        for supplier, extractor in extractors.items():
-            try:
-                df = extractor(pdf_path)
-                product_code_col = next((col for col in df.columns if col.strip().lower() == "product code"), None)
-                if not product_code_col:
-                    raise ValueError("❌ No se encontró la columna 'Product Code' en el DataFrame extraído.")
-                product_codes = set(df[product_code_col].astype(str))
-
-                match_supplier = detect_supplier(product_codes, product_db)
-
-                if match_supplier and len(product_codes & product_db[match_supplier]) > best_match_count:
-                    best_supplier = match_supplier
-                    best_df = df
-                    best_match_count = len(product_codes & product_db[match_supplier])
-            except Exception as e:
-                print(f"❌ Error processing {filename} with extractor {supplier}: {e}")
-                continue
-
         if best_supplier and best_df is not None:
             output_path = os.path.join(output_base, best_supplier, os.path.splitext(filename)[0] + ".xlsx")
             best_df.to_excel(output_path, index=False)
@@ -309,6 +530,3 @@ if __name__ == "__main__":
 
         else:
             print(f"❌ Could not detect the supplier for {filename}")
-
-
-
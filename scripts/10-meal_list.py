@@ -1,11 +1,15 @@
 #!/usr/bin/env python3
+from __future__ import annotations
 import argparse
+import json
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from pathlib import Path
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.utils import get_column_letter
-from openpyxl.styles import PatternFill, Alignment, Font, Border, Side
+from openpyxl.styles import PatternFill, Alignment, Font, Border, Side, NamedStyle
 
 # Índices de columnas en el CSV
 ROOM_IDX = 8      # Columna I
@@ -16,10 +20,61 @@ STATUS_IDX = 4    # Columna E
 
 STATUS_EXCLUDE = {"cancelled", "checked out"}  # case-insensitive
 
+# Reglas de meal option: en orden, gana la primera regla con alguna keyword en la nota
+# (case-insensitive). Se leen de assets/meal_rules.json (o --rules); estas son las de respaldo.
+SCRIPTS_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = SCRIPTS_DIR.parent
+MEAL_RULES_PATH = PROJECT_ROOT / "assets" / "meal_rules.json"
+DEFAULT_MEAL_RULES = {
+    "default": "NO INFO ⚠️",
+    "rules": [
+        {"label": "MEAL PACKAGE", "keywords": ["meal package"]},
+        {"label": "BILL TO ROOM", "keywords": ["bill to room"]},
+        {"label": "ROOM ONLY", "keywords": ["room only"]},
+        {"label": "BREAKFAST ONLY", "keywords": ["breakfast only", "breakfast"]},
+    ],
+}
+
 def today_str():
     return datetime.now().strftime("%d-%m-%Y")
 
-def build_meal_list(df: pd.DataFrame) -> pd.DataFrame:
+def load_meal_rules(path: Path | None = None) -> dict:
+    """Reglas de assets/meal_rules.json (o 'path'); sin archivo, DEFAULT_MEAL_RULES."""
+    path = Path(path) if path else MEAL_RULES_PATH
+    if not path.exists():
+        if path != MEAL_RULES_PATH:
+            raise FileNotFoundError(f"No se encontró el archivo de reglas: {path}")
+        return DEFAULT_MEAL_RULES
+    with open(path, "r", encoding="utf-8") as f:
+        rules = json.load(f)
+    if not rules.get("rules") or any(not r.get("label") or not r.get("keywords") for r in rules["rules"]):
+        raise ValueError(f"Reglas inválidas en {path}: cada regla necesita 'label' y 'keywords'")
+    return {"default": rules.get("default", DEFAULT_MEAL_RULES["default"]), "rules": rules["rules"]}
+
+def classify_meal_options(notes: pd.Series, rules: dict | None = None) -> pd.Series:
+    """
+    Meal option de cada nota. Las notas se factorizan: cada texto distinto se clasifica
+    una sola vez con la tabla de reglas (en orden) y el resultado se reparte a todas las
+    filas de una vez, así que las notas repetidas de un export de varias semanas no se
+    vuelven a revisar.
+    """
+    rules = rules or DEFAULT_MEAL_RULES
+    # (keyword, label) en orden de regla: la primera keyword presente decide
+    table = [(k.lower(), r["label"]) for r in rules["rules"] for k in r["keywords"]]
+    default = rules["default"]
+
+    def first_rule(note: str) -> str:
+        low = note.lower()
+        for keyword, label in table:
+            if keyword in low:
+                return label
+        return default
+
+    codes, uniques = pd.factorize(notes.astype(str), use_na_sentinel=False)
+    labels = np.array([first_rule(str(u)) for u in uniques.tolist()], dtype=object)
+    return pd.Series(labels[codes], index=notes.index)
+
+def build_meal_list(df: pd.DataFrame, rules: dict | None = None) -> pd.DataFrame:
     surname_series = df.iloc[:, SURNAME_IDX].astype(str)
     status_series = df.iloc[:, STATUS_IDX].astype(str)
 
@@ -43,101 +98,78 @@ def build_meal_list(df: pd.DataFrame) -> pd.DataFrame:
         out[c] = out[c].astype(str).str.strip()
 
     # Interpretar meal option desde las notas
-    def detect_package(note: str) -> str:
-        note_low = str(note).lower()
-        if "meal package" in note_low:
-            return "MEAL PACKAGE"
-        elif "bill to room" in note_low:
-            return "BILL TO ROOM"
-        elif "room only" in note_low:
-            return "ROOM ONLY"
-        elif "breakfast only" in note_low or "breakfast" in note_low:
-            return "BREAKFAST ONLY"
-        else:
-            return "NO INFO ⚠️"
-
-    out["Meal option"] = out["Meal option"].apply(detect_package)
+    out["Meal option"] = classify_meal_options(out["Meal option"], rules)
 
     out = out.sort_values(by="Room", key=lambda col: col.astype(str).str.lower()).reset_index(drop=True)
     return out
 
-def write_excel(meals_df: pd.DataFrame, out_path: Path, date_text: str):
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Meals"
+# Colores hex
+FILL_COLORS = {
+    "MEAL PACKAGE":   "DCE6F1",
+    "BILL TO ROOM":   "EBF1DE",
+    "ROOM ONLY":      "F2DCDB",
+    "BREAKFAST ONLY": "E4DFEC",
+}
 
-    # Encabezados de Excel
-    ws.cell(row=1, column=1).value = "MEALS LIST"
-    ws.cell(row=2, column=1).value = date_text
-    headers = ["Room", "Name", "Surname", "Meal option"]
-    for j, h in enumerate(headers, start=1):
-        ws.cell(row=3, column=j).value = h
+def _named_styles():
+    """Estilos compartidos: se registran una vez por workbook y cada celda solo guarda el nombre."""
+    thin = Side(style="thin", color="000000")
+    all_borders = Border(left=thin, right=thin, top=thin, bottom=thin)
+    center = Alignment(horizontal="center", vertical="center")
+    center_wrap = Alignment(horizontal="center", vertical="center", wrap_text=True)
+
+    styles = [
+        NamedStyle(name="meals_title", font=Font(name="Aptos", size=20, bold=True), alignment=center, border=all_borders),
+        NamedStyle(name="meals_header", font=Font(name="Aptos", size=14, bold=True), alignment=center, border=all_borders),
+        NamedStyle(name="meals_cell_wrap", font=Font(name="Aptos", size=14), alignment=center_wrap, border=all_borders),
+        NamedStyle(name="meals_cell", font=Font(name="Aptos", size=14), alignment=center, border=all_borders),
+    ]
+    for option, color in FILL_COLORS.items():
+        styles.append(NamedStyle(
+            name=f"meals_{option.lower().replace(' ', '_')}",
+            font=Font(name="Aptos", size=14),
+            alignment=center,
+            border=all_borders,
+            fill=PatternFill(start_color=color, end_color=color, fill_type="solid"),
+        ))
+    return styles
 
-    # Datos
-    for i, r in enumerate(meals_df.itertuples(index=False), start=4):
-        ws.cell(row=i, column=1).value = r[0]
-        ws.cell(row=i, column=2).value = r[1]
-        ws.cell(row=i, column=3).value = r[2]
-        ws.cell(row=i, column=4).value = r[3]
+def write_excel(meals_df: pd.DataFrame, out_path: Path, date_text: str):
+    # write-only: las filas se escriben en streaming con estilos con nombre
+    wb = Workbook(write_only=True)
+    for style in _named_styles():
+        wb.add_named_style(style)
+    ws = wb.create_sheet("Meals")
 
     # Anchos de columnas
     widths = [12, 22, 22, 24]
     for idx, w in enumerate(widths, start=1):
         ws.column_dimensions[get_column_letter(idx)].width = w
 
-    # --- FORMATO ---
     # Merge de título y fecha
-    ws.merge_cells('A1:D1')
-    ws.merge_cells('A2:D2')
-
-    # Fuente y alineación para título
-    ws['A1'].font = Font(name="Aptos", size=20, bold=True)
-    ws['A1'].alignment = Alignment(horizontal="center", vertical="center")
-
-    # Fuente y alineación para fecha
-    ws['A2'].font = Font(name="Aptos", size=20, bold=True)
-    ws['A2'].alignment = Alignment(horizontal="center", vertical="center")
-
-    # Encabezados (fila 3)
-    for cell in ws[3]:
-        cell.font = Font(name="Aptos", size=14, bold=True)
-        cell.alignment = Alignment(horizontal="center", vertical="center")
-
-    # Filas de datos (desde la 4)
-    for row in ws.iter_rows(min_row=4, max_row=ws.max_row, min_col=1, max_col=4):
-        for cell in row:
-            cell.font = Font(name="Aptos", size=14)
-            cell.alignment = Alignment(horizontal="center", vertical="center")
-
-    # Wrap text en columnas A, B y C
-    for r in range(4, ws.max_row + 1):
-        ws.cell(row=r, column=1).alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-        ws.cell(row=r, column=2).alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-        ws.cell(row=r, column=3).alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-
-    # Colores hex
-    FILL_COLORS = {
-        "MEAL PACKAGE":   "DCE6F1",
-        "BILL TO ROOM":   "EBF1DE",
-        "ROOM ONLY":      "F2DCDB",
-        "BREAKFAST ONLY": "E4DFEC",
-    }
-
-    # Aplicar colores de fondo en la columna "Meal option"
-    for i in range(4, ws.max_row + 1):
-        meal_value = ws.cell(row=i, column=4).value
-        if meal_value in FILL_COLORS:
-            ws.cell(row=i, column=4).fill = PatternFill(
-                start_color=FILL_COLORS[meal_value],
-                end_color=FILL_COLORS[meal_value],
-                fill_type="solid"
-            )
+    ws.merged_cells.add('A1:D1')
+    ws.merged_cells.add('A2:D2')
 
-    thin = Side(style="thin", color="000000")
-    all_borders = Border(left=thin, right=thin, top=thin, bottom=thin)
-    for row in ws.iter_rows(min_row=1, max_row=ws.max_row, min_col=1, max_col=4):
-        for cell in row:
-            cell.border = all_borders
+    def styled_row(values, styles):
+        cells = []
+        for value, style in zip(values, styles):
+            cell = WriteOnlyCell(ws, value=value)
+            cell.style = style
+            cells.append(cell)
+        return cells
+
+    # Encabezados de Excel
+    ws.append(styled_row(["MEALS LIST", None, None, None], ["meals_title"] * 4))
+    ws.append(styled_row([date_text, None, None, None], ["meals_title"] * 4))
+    headers = ["Room", "Name", "Surname", "Meal option"]
+    ws.append(styled_row(headers, ["meals_header"] * 4))
+
+    # Datos (wrap text en columnas A, B y C; color de fondo en "Meal option")
+    wrap = ["meals_cell_wrap"] * 3
+    for r in meals_df.itertuples(index=False):
+        meal_value = r[3]
+        meal_style = f"meals_{meal_value.lower().replace(' ', '_')}" if meal_value in FILL_COLORS else "meals_cell"
+        ws.append(styled_row(r[:4], wrap + [meal_style]))
 
     wb.save(out_path)
 
@@ -145,6 +177,7 @@ def main_cli():
     parser = argparse.ArgumentParser(description="Generate Meals List from bookings CSV")
     parser.add_argument("--input", required=False, help="Ruta al CSV (bookings report). Si no se pasa, se busca bookings_report*.csv en el cwd.")
     parser.add_argument("--out", required=False, help="Ruta de salida .xlsx")
+    parser.add_argument("--rules", required=False, help="JSON con las reglas de meal option (default: assets/meal_rules.json)")
     args = parser.parse_args()
 
     # Resolver input
@@ -165,7 +198,7 @@ def main_cli():
 
     print(f"Usando reporte: {csv_path.name}")
     df = pd.read_csv(csv_path, encoding="utf-8-sig")
-    meals_df = build_meal_list(df)
+    meals_df = build_meal_list(df, load_meal_rules(args.rules))
     write_excel(meals_df, out_path, date_text)
     print(f"✅ Meal list creada: {out_path.name}")
 
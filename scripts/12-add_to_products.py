@@ -7,6 +7,8 @@ from pathlib import Path
 from openpyxl import load_workbook, Workbook
 from openpyxl.styles import Alignment, Font, PatternFill
 
+import catalog
+
 # Categorías que NO se deben modificar desde el script
 SKIP_CATEGORIES = {"Beer on tap"}
 
@@ -248,6 +250,8 @@ def add_to_products_xlsx(products_path: str, supplier: str, code: str, name: str
         code_cell.alignment = Alignment(horizontal="center")
         code_cell.number_format = "@"
         save_wb(wb, products_path)
+        # El snapshot compilado ya no corresponde al workbook: forzar recompilación
+        catalog.invalidate(products_path)
         print(f"OK products.xlsx: [{code}] {name_with_unit}")
         return 0
     except Exception as e:
@@ -1,13 +1,13 @@
-import re
 import pandas as pd
 from pathlib import Path
 from datetime import datetime, timedelta
 from openpyxl import Workbook
-from openpyxl.styles import Font
-from openpyxl.utils.dataframe import dataframe_to_rows
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, NamedStyle
 from openpyxl.worksheet.datavalidation import DataValidation
 from openpyxl.formatting.rule import FormulaRule
 from openpyxl.styles import PatternFill
+from catalog import load_catalog
 
 def get_next_thursday():
     today = datetime.today()
@@ -58,28 +58,32 @@ except Exception as e:
 PDF_INVOICES_ROOT = PROJECT_ROOT / "PDF_invoices"
 
 # Cargar todas las hojas del catálogo de productos y combinarlas
-xls = pd.ExcelFile(PRODUCTS_FILE)
+catalog_sheets = load_catalog(PRODUCTS_FILE).sheets
 all_products = []
 
-for sheet in xls.sheet_names:
-    df = xls.parse(sheet)
+for sheet, df in catalog_sheets.items():
     df.columns = [col.strip().lower().replace(" ", "_") for col in df.columns]
     df["product_code"] = df["product_code"].astype(str).str.strip()
     df["product_name"] = df["product_name"].astype(str).str.strip()
-    # Expandir múltiples códigos por fila
-    expanded_rows = []
-    for _, row in df.iterrows():
-        codes = [code.strip() for code in re.split(r"[\/,;]", row["product_code"]) if code.strip()]
-        for code in codes:
-            expanded_rows.append({"product_code": code, "product_name": row["product_name"]})
-
-    all_products.append(pd.DataFrame(expanded_rows))
+    # Expandir múltiples códigos por fila (vectorizado: split + explode)
+    expanded = (
+        df[["product_code", "product_name"]]
+        .assign(product_code=df["product_code"].str.split(r"[\/,;]", regex=True))
+        .explode("product_code")
+    )
+    expanded["product_code"] = expanded["product_code"].str.strip()
+    all_products.append(expanded[expanded["product_code"] != ""])
 
 products_df = pd.concat(all_products, ignore_index=True)
 
-# Preparar Excel de salida
-wb = Workbook()
-wb.remove(wb.active)
+# Índice código -> nombre (si un código se repite, gana la primera hoja/fila)
+code_index = products_df.drop_duplicates("product_code").set_index("product_code")["product_name"]
+
+# Preparar Excel de salida (write-only: las filas se escriben en streaming)
+wb = Workbook(write_only=True)
+header_style = NamedStyle(name="checklist_header", font=Font(bold=True))
+wb.add_named_style(header_style)
+received_fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
 
 # Iterar por cada proveedor
 root_dir = Path(INVOICES_ROOT)
@@ -106,14 +110,9 @@ for supplier_folder in root_dir.iterdir():
         if supplier_data:
             combined = pd.concat(supplier_data, ignore_index=True)
 
-            # Combinar con catálogo
-            merged = pd.merge(
-                combined,
-                products_df,
-                how="left",
-                left_on="product_code",
-                right_on="product_code"
-            )
+            # Combinar con catálogo a través del índice de códigos
+            merged = combined.copy()
+            merged["product_name"] = merged["product_code"].map(code_index)
 
             # Detectar códigos no encontrados
             unknown_codes = merged[merged["product_name"].isna()]["product_code"].unique()
@@ -137,23 +136,27 @@ for supplier_folder in root_dir.iterdir():
 
             # Agregar hoja al Excel
             ws = wb.create_sheet(title=supplier_name[:31])
-            for r_idx, row in enumerate(dataframe_to_rows(checklist_df, index=False, header=True), 1):
-                for c_idx, value in enumerate(row, 1):
-                    cell = ws.cell(row=r_idx, column=c_idx, value=value)
-                    if r_idx == 1:
-                        cell.font = Font(bold=True)
-            
+            last_row = len(checklist_df) + 1
+
+            # Validación y formato condicional se declaran por rango, antes de escribir filas
             # Validación de datos en columna A (Recibido): Sí / No
             dv = DataValidation(type="list", formula1='"✅,❌"', allow_blank=True)
-            ws.add_data_validation(dv)
-            for row in range(2, len(checklist_df) + 2):
-                dv.add(ws[f"A{row}"])
+            dv.add(f"A2:A{last_row}")
+            ws.data_validations.append(dv)
 
             # Formato condicional: si la celda en A es "Sí", toda la fila se pone verde claro
-            fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
             formula = '$A2="✅"'
-            rule = FormulaRule(formula=[formula], fill=fill)
-            ws.conditional_formatting.add(f"A2:C{len(checklist_df)+1}", rule)
+            rule = FormulaRule(formula=[formula], fill=received_fill)
+            ws.conditional_formatting.add(f"A2:C{last_row}", rule)
+
+            header_cells = []
+            for col in checklist_df.columns:
+                cell = WriteOnlyCell(ws, value=col)
+                cell.style = header_style.name
+                header_cells.append(cell)
+            ws.append(header_cells)
+            for row in checklist_df.itertuples(index=False):
+                ws.append(list(row))
 
 #Si no hay archivos excel de invoices
 if not wb.sheetnames:
@@ -1,7 +1,8 @@
 import os
 import pandas as pd
 from openpyxl import load_workbook
-from difflib import get_close_matches
+import numpy as np
+from rapidfuzz import fuzz, process
 
 def normalize(text):
     if pd.isna(text):
@@ -16,6 +17,38 @@ def normalize(text):
     )
 
 
+SUGGESTION_CUTOFF = 85
+SUGGESTIONS_PER_NAME = 3
+
+
+def suggest_matches(missing_names, template_names):
+    """
+    Resuelve todos los nombres no encontrados en una sola pasada:
+    una matriz de similitud (rapidfuzz cdist, todos los núcleos) contra los nombres de la plantilla.
+    Devuelve un DataFrame ordenado por score con hasta SUGGESTIONS_PER_NAME sugerencias por nombre.
+    """
+    if not missing_names or not template_names:
+        return pd.DataFrame(columns=["Name", "Suggestion", "Score", "Rank"])
+
+    scores = process.cdist(
+        missing_names, template_names,
+        scorer=fuzz.ratio, score_cutoff=SUGGESTION_CUTOFF, workers=-1,
+    )
+    k = min(SUGGESTIONS_PER_NAME, len(template_names))
+    top = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+
+    rows = []
+    for i, name in enumerate(missing_names):
+        for rank, j in enumerate(top[i], start=1):
+            score = round(float(scores[i, j]))
+            if score < SUGGESTION_CUTOFF:
+                break
+            rows.append({"Name": name, "Suggestion": template_names[j], "Score": score, "Rank": rank})
+
+    table = pd.DataFrame(rows, columns=["Name", "Suggestion", "Score", "Rank"])
+    return table.sort_values(["Score", "Name", "Rank"], ascending=[False, True, True], kind="stable").reset_index(drop=True)
+
+
 # Rutas de archivos
 import sys
 import shutil
@@ -90,20 +123,25 @@ for sheet_name in wb.sheetnames:
         ws.cell(row=row, column=sold_qty_col).value = 0
 
 
-# Asignar cantidades desde el CSV combinado
-for _, row in lightspeed_df.iterrows():
-    name = row["Product_norm"]
-    qty = row["Quantity"]
-
+# Asignar cantidades desde el CSV combinado (coincidencia exacta por índice)
+missing = []
+for name, qty in zip(lightspeed_df["Product_norm"], lightspeed_df["Quantity"]):
     if name in products_index:
         sheet_name, row_idx, col_idx = products_index[name]
         wb[sheet_name].cell(row=row_idx, column=col_idx).value = qty
     else:
-        similar = get_close_matches(name, products_index.keys(), n=1, cutoff=0.85)
-        if similar:
-            print(f"⚠️ No encontrado: '{name}' — ¿Querías decir: '{similar[0]}'?")
-        else:
-            not_found.append(name)
+        missing.append(name)
+
+# Nombres no encontrados: sugerencias difusas en un solo lote
+missing = list(dict.fromkeys(missing))
+suggestions = suggest_matches(missing, list(products_index.keys()))
+suggested = set(suggestions["Name"])
+not_found.extend(name for name in missing if name not in suggested)
+
+if not suggestions.empty:
+    print(f"\n⚠️ Not found, did you mean ({len(suggested)}):")
+    for _, s in suggestions.iterrows():
+        print(f"• {s['Name']} → {s['Suggestion']} ({s['Score']}%, #{s['Rank']})")
 
 # Guardar archivo modificado
 wb.save(output_path)
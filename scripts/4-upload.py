@@ -1,21 +1,53 @@
 from playwright.sync_api import sync_playwright
 import time
-import random
 import os
 import pandas as pd
 import sys
 import re
+import argparse
+import queue
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from catalog import load_catalog
+from pacing import Pacer, PROFILES, resolve_profile_name
+from kounta_api import KountaAPIError, KountaPurchaseAPI
+from upload_journal import UploadJournal, order_key_for
+from product_index import ProductIndex, api_fetcher, browser_fetcher, load_index
+from browser_session import BROWSER_ARGS, CONTEXT_OPTIONS, STEALTH_INIT_SCRIPT, attach as attach_session, session_is_logged_in
+
+ORDERS_URL = "https://purchase.kounta.com/purchase#orders"
+
+SUPPLIER_LABELS = {
+    "alm": "ALM",
+    "cub": "CUB",
+    "lion": "LION",
+    "coke": "COKE"
+}
+
+# Se suma 10% al total de estos proveedores, salvo los productos sin impuesto
+TAXED_SUPPLIERS = {"cub", "lion", "coke"}
+NO_TAX_PRODUCTS = {"Mt FRANKLIN 600ml S1", "Mt FRANKLIN 1.5L S1"}
+
 
 class KountaLogin:
-    def __init__(self):
+    def __init__(self, pacing=None, workers=1, journal=True):
         self.email = ""  # Tu email aquí
         self.password = ""  # Tu contraseña aquí
         self.login_url = "https://my.kounta.com/login"  # Ajusta la URL según sea necesario
+        self.pacer = Pacer(resolve_profile_name(pacing))
+        self.workers = max(1, int(workers or 1))  # >1: subir varias órdenes en paralelo
+        self.only_files = None  # set de nombres de Excel a procesar (None = todos)
+        self.journal = UploadJournal() if journal else None  # retomar POs cortadas a la mitad
+        self._journal_key = None  # factura en curso dentro del journal
+        self.upload_results = []  # {"file", "ok", "seconds", "error"} de cada orden (API y navegador)
+        self.product_index = ProductIndex([])  # lista de productos de Lightspeed (se baja al iniciar sesión)
+        self._targeted_filter = True  # False si el buscador no filtra sin Enter
         
-    def random_delay(self, min_seconds=1, max_seconds=3):
-        """Simula delays humanos aleatorios"""
-        time.sleep(random.uniform(min_seconds, max_seconds))
+    def random_delay(self, min_seconds=1, max_seconds=3, page=None):
+        """Pausa según el perfil de pacing (con page: espera network idle antes, si el perfil lo usa)"""
+        self.pacer.delay(min_seconds, max_seconds, page=page)
         
     def setup_browser_context(self, browser):
         """Configura el contexto del navegador para evitar detección"""
@@ -40,10 +72,7 @@ class KountaLogin:
         element = page.locator(selector)
         element.click()
         self.random_delay(0.5, 1)
-        
-        for char in text:
-            element.type(char)
-            time.sleep(random.uniform(0.05, 0.15))
+        self.pacer.type_chars(element, text)
     
     @staticmethod
     def _norm_code(code) -> str:
@@ -66,6 +95,14 @@ class KountaLogin:
         s = re.sub(r"^0+(?!$)", "", s)
         return s
 
+    @staticmethod
+    def _adjusted_cost(supplier, product_name, total_cost) -> float:
+        """Invoice total → PO total: +10% for CUB/LION/COKE, except the no-tax water SKUs."""
+        adjusted_cost = float(total_cost)
+        if supplier in TAXED_SUPPLIERS and product_name not in NO_TAX_PRODUCTS:
+            adjusted_cost = round(adjusted_cost * 1.10, 2)
+        return adjusted_cost
+
     def _build_product_lookup(self, lookup_df: pd.DataFrame) -> dict:
         """
         Build a mapping: normalized_code -> Product Name
@@ -99,61 +136,37 @@ class KountaLogin:
     def login(self, profile_name="Bot-Profile", supplier="alm"):
         """Proceso principal de login"""
         with sync_playwright() as p:
-            # Crear ruta del perfil personalizado
-            profile_path = os.path.join(os.getcwd(), "chrome-profiles", profile_name)
-            
-            # Crear directorio del perfil si no existe
-            os.makedirs(profile_path, exist_ok=True)
-            
-            # Lanzar navegador con contexto persistente (perfil personalizado)
-            context = p.chromium.launch_persistent_context(
-                user_data_dir=profile_path,
-                headless=False,  # Cambiar a True para modo headless
-                viewport={'width': 1366, 'height': 768},
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                locale='es-ES',
-                timezone_id='Europe/Madrid',
-                extra_http_headers={
-                    'Accept-Language': 'es-ES,es;q=0.9,en;q=0.8',
-                    'Accept-Encoding': 'gzip, deflate, br',
-                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                    'DNT': '1',
-                    'Connection': 'keep-alive',
-                    'Upgrade-Insecure-Requests': '1',
-                },
-                args=[
-                    '--no-sandbox',
-                    '--disable-blink-features=AutomationControlled',
-                    '--disable-web-security',
-                    '--disable-features=VizDisplayCompositor',
-                    '--disable-dev-shm-usage',
-                    '--no-first-run',
-                    '--disable-extensions',
-                    '--disable-plugins',
-                    '--disable-default-apps',
-                    '--disable-background-mode'
-                ]
-            )
-            
+            # Sesión compartida (scripts/browser_session.py serve) si está corriendo
+            shared_context = attach_session(p)
+            if shared_context is not None:
+                context = shared_context
+            else:
+                # Crear ruta del perfil personalizado
+                profile_path = os.path.join(os.getcwd(), "chrome-profiles", profile_name)
+
+                # Crear directorio del perfil si no existe
+                os.makedirs(profile_path, exist_ok=True)
+
+                # Lanzar navegador con contexto persistente (perfil personalizado)
+                context = p.chromium.launch_persistent_context(
+                    user_data_dir=profile_path,
+                    headless=False,  # Cambiar a True para modo headless
+                    args=BROWSER_ARGS,
+                    **CONTEXT_OPTIONS,
+                )
+
+            page = None
             try:
                 # Con launch_persistent_context, ya tenemos el contexto directamente
                 page = context.new_page()
                 
                 # Ocultar webdriver
-                page.add_init_script("""
-                    Object.defineProperty(navigator, 'webdriver', {
-                        get: () => undefined,
-                    });
-                    
-                    window.chrome = {
-                        runtime: {},
-                    };
-                    
-                    Object.defineProperty(navigator, 'plugins', {
-                        get: () => [1, 2, 3, 4, 5],
-                    });
-                """)
-                
+                page.add_init_script(STEALTH_INIT_SCRIPT)
+
+                if shared_context is not None and session_is_logged_in(page, ORDERS_URL):
+                    print("✅ Sesión activa, sin pasar por el login")
+                    return self._process_supplier(page, context, supplier)
+
                 print("Navegando a la página de login...")
                 page.goto(self.login_url, wait_until='networkidle')
                 self.random_delay(2, 4)
@@ -285,45 +298,12 @@ class KountaLogin:
                     # Navegar a la página de órdenes
                     print("Navegando a la página de órdenes...")
                     self.random_delay(2, 4)
-                    page.goto("https://purchase.kounta.com/purchase#orders", wait_until='networkidle')
+                    page.goto(ORDERS_URL, wait_until='networkidle')
                     self.random_delay(3, 5)
                     
                     print(f"✅ Navegado a: {page.url}")
 
-                    # Configure folders and data (no 'processed' folder anymore)
-                    excel_invoices_folder = os.path.join(os.path.dirname(os.path.dirname(__file__)), "Excel_invoices")
-                    input_folder = os.path.join(excel_invoices_folder, supplier)  # Excel_invoices/<supplier>
-                    assets_folder = os.path.join(os.path.dirname(os.path.dirname(__file__)), "assets")
-
-                    # Load & normalize product lookup for the selected supplier
-                    try:
-                        sheet_name = supplier.upper()  # ALM, COKE, CUB, LION
-                        lookup_df = pd.read_excel(
-                            os.path.join(assets_folder, "products.xlsx"),
-                            sheet_name=sheet_name,
-                            dtype={"Product Code": str, "Product Name": str}
-                        )
-                        product_lookup = self._build_product_lookup(lookup_df)
-                        print(f"📋 {sheet_name}: {len(lookup_df)} rows → {len(product_lookup)} unique codes (expanded & normalized)")
-                    except Exception as e:
-                        print(f"❌ Failed to load products.xlsx sheet '{sheet_name}': {e}")
-                        return False
-
-                    # Supplier label lookup
-                    supplier_lookup = {
-                        "alm": "ALM",
-                        "cub": "CUB", 
-                        "lion": "LION",
-                        "coke": "COKE"
-                    }
-
-                    print(f"📦 Processing supplier: {supplier_lookup[supplier]}")
-
-                    # Process Excel files (no moving to 'processed' folder here)
-                    self.process_excel_files(page, input_folder, supplier, product_lookup, supplier_lookup)
-
-
-                    return True
+                    return self._process_supplier(page, context, supplier)
                 
                 else:
                     print("❌ El login parece haber fallado")
@@ -353,78 +333,459 @@ class KountaLogin:
                 return False
             
             finally:
-                # Always close the browser so the process exits and Streamlit can detect completion
-                try:
-                    # Close any open pages first (optional but tidy)
+                if shared_context is not None:
+                    # El contexto compartido sigue vivo para la próxima corrida: solo cerrar nuestra página
                     try:
-                        for p in context.pages:
-                            try:
-                                p.close()
-                            except Exception:
-                                pass
+                        if page is not None:
+                            page.close()
                     except Exception:
                         pass
+                else:
+                    # Always close the browser so the process exits and Streamlit can detect completion
+                    try:
+                        # Close any open pages first (optional but tidy)
+                        try:
+                            for p in context.pages:
+                                try:
+                                    p.close()
+                                except Exception:
+                                    pass
+                        except Exception:
+                            pass
 
-                    context.close()
-                    # tiny wait to ensure underlying process exits cleanly
-                    time.sleep(0.3)
-                    print("🔚 Browser context closed.")
-                except Exception as e:
-                    print(f"⚠️ Failed to close browser context: {e}")
+                        context.close()
+                        # tiny wait to ensure underlying process exits cleanly
+                        time.sleep(0.3)
+                        print("🔚 Browser context closed.")
+                    except Exception as e:
+                        print(f"⚠️ Failed to close browser context: {e}")
+                print(self.pacer.summary())
+
+    def _process_supplier(self, page, context, supplier):
+        """Logged in and on the orders page: upload every invoice of 'supplier'."""
+        loaded = self._load_supplier_data(supplier)
+        if loaded is None:
+            return False
+        input_folder, product_lookup, supplier_lookup = loaded
+
+        # Una sola descarga de la lista de productos por sesión (evita buscar con Enter en cada línea)
+        self.product_index = load_index(browser_fetcher(context))
+
+        # Process Excel files (no moving to 'processed' folder here)
+        self.process_excel_files(page, input_folder, supplier, product_lookup, supplier_lookup, context=context)
+        return True
+
+    def _load_supplier_data(self, supplier):
+        """
+        Folders and lookups for one supplier.
+        Returns (input_folder, product_lookup, supplier_lookup), or None if products.xlsx can't be read.
+        """
+        # Configure folders and data (no 'processed' folder anymore)
+        excel_invoices_folder = os.path.join(os.path.dirname(os.path.dirname(__file__)), "Excel_invoices")
+        input_folder = os.path.join(excel_invoices_folder, supplier)  # Excel_invoices/<supplier>
+        assets_folder = os.path.join(os.path.dirname(os.path.dirname(__file__)), "assets")
+
+        # Load & normalize product lookup for the selected supplier
+        try:
+            sheet_name = supplier.upper()  # ALM, COKE, CUB, LION
+            lookup_df = load_catalog(os.path.join(assets_folder, "products.xlsx")).sheet(sheet_name)
+            product_lookup = self._build_product_lookup(lookup_df)
+            print(f"📋 {sheet_name}: {len(lookup_df)} rows → {len(product_lookup)} unique codes (expanded & normalized)")
+        except Exception as e:
+            print(f"❌ Failed to load products.xlsx sheet '{sheet_name}': {e}")
+            return None
+
+        print(f"📦 Processing supplier: {SUPPLIER_LABELS[supplier]}")
+        return input_folder, product_lookup, SUPPLIER_LABELS
+
+    def _load_order(self, excel_path, supplier, product_lookup):
+        """
+        Read one invoice Excel and normalize its codes.
+        Returns (df, admin_fee_value), or None if some product codes are missing from the lookup.
+        """
+        df = pd.read_excel(excel_path, engine="openpyxl")
+
+        # ADMIN FEE logic
+        admin_fee_value = None
+        if supplier == "alm" and "Admin fee" in df.columns:
+            try:
+                value = float(df.at[0, "Admin fee"])
+                if value > 0:
+                    admin_fee_value = round(value, 2)
+            except Exception as e:
+                print(f"⚠️ Could not read Admin Fee: {e}")
+
+        # Normalize order codes exactly like the lookup
+        df["Product Code"] = df["Product Code"].apply(self._norm_code)
+        missing = set(df["Product Code"]) - set(product_lookup.keys())
+        if missing:
+            print(f"⛔ Missing product codes in lookup: {missing}")
+            return None
+
+        return df, admin_fee_value
 
-    def process_excel_files(self, page, input_folder, supplier, product_lookup, supplier_lookup):
+    def process_excel_files(self, page, input_folder, supplier, product_lookup, supplier_lookup, context=None):
         """
         Process Excel files and create the orders.
+        With self.workers > 1 (and a context to copy the session from) independent POs
+        are uploaded in parallel; otherwise one after the other on 'page'.
         NOTE: This function no longer moves files to a 'processed' folder.
             The cleanup is managed externally (e.g., by main_gui.py after successful upload).
         """
 
         # Gather Excel files (xlsx/xls if you really need .xls; recommend .xlsx only)
-        excel_files = [f for f in os.listdir(input_folder) if f.lower().endswith(('.xlsx', '.xls'))]
+        excel_files = sorted(f for f in os.listdir(input_folder) if f.lower().endswith(('.xlsx', '.xls')))
+        if self.only_files is not None:
+            # Fallback del backend API: solo las órdenes que no se pudieron subir por HTTP
+            excel_files = [f for f in excel_files if f in self.only_files]
 
         if not excel_files:
             print("No Excel files found to process.")
             return
 
+        summary = []
+        orders = []
         for excel_file in excel_files:
-            print(f"\n📄 Processing: {excel_file}")
-            excel_path = os.path.join(input_folder, excel_file)
+            loaded = self._load_order(os.path.join(input_folder, excel_file), supplier, product_lookup)
+            if loaded is None:
+                summary.append({"file": excel_file, "ok": False, "seconds": 0.0, "error": "missing product codes"})
+                continue
+            orders.append((excel_file, *loaded))
+
+        # Nombres que no están en la lista de productos de Lightspeed: avisar antes de tocar ninguna PO
+        for excel_file, df, _ in orders:
+            unknown = self.product_index.missing(product_lookup[c] for c in df["Product Code"])
+            if unknown:
+                print(f"⚠️ {excel_file}: not in the Lightspeed product list: {', '.join(sorted(set(unknown)))}")
+
+        if self.workers > 1 and len(orders) > 1 and context is not None:
+            summary.extend(self._process_orders_concurrently(context, orders, supplier, product_lookup, supplier_lookup))
+        else:
+            for excel_file, df, admin_fee_value in orders:
+                print(f"\n📄 Processing: {excel_file}")
+                start = time.perf_counter()
+
+                # Process the single order
+                success = self.process_single_order(page, df, supplier, product_lookup, supplier_lookup, admin_fee_value, excel_file)
+                summary.append({"file": excel_file, "ok": bool(success), "seconds": time.perf_counter() - start, "error": None})
+
+                # IMPORTANT: do NOT move/delete the file here.
+                if success:
+                    print("✅ Order processed successfully (no file move; cleanup handled by caller).")
+
+                self.random_delay(3, 5, page=page)
+
+        self.upload_results.extend(summary)
+        self._print_upload_summary(summary)
 
-            # Read the Excel
-            df = pd.read_excel(excel_path, engine="openpyxl")
+    def _process_orders_concurrently(self, context, orders, supplier, product_lookup, supplier_lookup):
+        """
+        Upload independent POs in parallel.
+
+        The sync Playwright API can't drive several pages of one context from different threads,
+        so the logged-in session (cookies + localStorage) is exported with storage_state() and
+        each worker thread opens its own browser seeded with it. Workers pull orders from a
+        shared queue until it is empty.
+        """
+        fd, state_path = tempfile.mkstemp(prefix="kounta_state_", suffix=".json")
+        os.close(fd)
+        context.storage_state(path=state_path)
+
+        jobs = queue.Queue()
+        for order in orders:
+            jobs.put(order)
+        results = []
+        lock = threading.Lock()
+        n_workers = min(self.workers, len(orders))
+        print(f"\n🧵 Uploading {len(orders)} orders with {n_workers} parallel browser workers")
 
-            # ADMIN FEE logic
-            admin_fee_value = None
-            if supplier == "alm" and "Admin fee" in df.columns:
+        try:
+            with ThreadPoolExecutor(max_workers=n_workers) as pool:
+                futures = [
+                    pool.submit(self._upload_worker, i + 1, state_path, jobs, results, lock,
+                                supplier, product_lookup, supplier_lookup)
+                    for i in range(n_workers)
+                ]
+                for future in futures:
+                    try:
+                        future.result()
+                    except Exception as e:
+                        print(f"❌ Upload worker crashed: {e}")
+        finally:
+            try:
+                os.remove(state_path)  # contiene cookies de sesión
+            except OSError:
+                pass
+
+        # Órdenes que ningún worker pudo tomar (p.ej. todos fallaron al abrir el navegador)
+        while not jobs.empty():
+            excel_file, _, _ = jobs.get_nowait()
+            results.append({"file": excel_file, "ok": False, "seconds": 0.0, "error": "not processed (no worker available)"})
+
+        return results
+
+    def _upload_worker(self, worker_id, state_path, jobs, results, lock, supplier, product_lookup, supplier_lookup):
+        """One thread = one Playwright instance + browser, processing orders until the queue is empty."""
+        bot = KountaLogin(pacing=self.pacer.profile.name, journal=False)
+        bot.journal = self.journal  # un solo journal (thread-safe) para todos los workers
+        bot.product_index = self.product_index
+        tag = f"[w{worker_id}]"
+        try:
+            with sync_playwright() as p:
+                browser = p.chromium.launch(headless=False, args=BROWSER_ARGS)
                 try:
-                    value = float(df.at[0, "Admin fee"])
-                    if value > 0:
-                        admin_fee_value = round(value, 2)
-                except Exception as e:
-                    print(f"⚠️ Could not read Admin Fee: {e}")
+                    context = browser.new_context(storage_state=state_path, **CONTEXT_OPTIONS)
+                    page = context.new_page()
+                    page.add_init_script(STEALTH_INIT_SCRIPT)
+                    page.goto(ORDERS_URL, wait_until="networkidle")
 
-            # Normalize order codes exactly like the lookup
-            df["Product Code"] = df["Product Code"].apply(self._norm_code)
-            missing = set(df["Product Code"]) - set(product_lookup.keys())
-            if missing:
-                print(f"⛔ Missing product codes in lookup: {missing}")
+                    while True:
+                        try:
+                            excel_file, df, admin_fee_value = jobs.get_nowait()
+                        except queue.Empty:
+                            break
+
+                        print(f"\n{tag} 📄 Processing: {excel_file}")
+                        start = time.perf_counter()
+                        error = None
+                        try:
+                            success = bot.process_single_order(page, df, supplier, product_lookup, supplier_lookup, admin_fee_value, excel_file)
+                        except Exception as e:
+                            success, error = False, str(e)
+                        with lock:
+                            results.append({"file": excel_file, "ok": bool(success), "seconds": time.perf_counter() - start, "error": error})
+                        print(f"{tag} {'✅' if success else '❌'} {excel_file}")
+
+                        bot.random_delay(3, 5, page=page)
+                finally:
+                    browser.close()
+        finally:
+            with lock:
+                self.pacer.slept += bot.pacer.slept
+                self.pacer.sleeps += bot.pacer.sleeps
+                self.pacer.waited += bot.pacer.waited
+                self.pacer.waits += bot.pacer.waits
+
+    @staticmethod
+    def _print_upload_summary(summary):
+        ok = sum(1 for r in summary if r["ok"])
+        print(f"\n📋 Upload summary: {ok}/{len(summary)} orders OK")
+        for r in sorted(summary, key=lambda r: r["file"]):
+            line = f"{'✅' if r['ok'] else '❌'} {r['file']} ({r['seconds']:.1f}s)"
+            if r["error"]:
+                line += f" — {r['error']}"
+            print(line)
+
+    # --- Batch HTTP backend (--backend api) ------------------------------------
+    def _api_lines(self, df, supplier, product_lookup, admin_fee_value):
+        """All lines of one invoice as the batch payload (same totals the keypad flow would type)."""
+        lines = []
+        for code, quantity, total_cost in zip(df["Product Code"], df["Order Qty"], df["Total Cost"]):
+            product_code = str(code).strip()
+            product_name = product_lookup.get(product_code)
+            if not product_name:
+                print(f"⚠️ Producto no encontrado para código: {product_code}")
                 continue
+            indexed = self.product_index.get(product_name)
+            lines.append({
+                "product_id": indexed["id"] if indexed else None,
+                "product_code": product_code,
+                "product_name": product_name,
+                "quantity": int(quantity),
+                "total_cost": self._adjusted_cost(supplier, product_name, total_cost),
+            })
+        if supplier == "alm" and admin_fee_value:
+            indexed = self.product_index.get("Administration Fee")
+            lines.append({
+                "product_id": indexed["id"] if indexed else None,
+                "product_code": None,
+                "product_name": "Administration Fee",
+                "quantity": 1,
+                "total_cost": float(admin_fee_value),
+            })
+        return lines
+
+    def _upload_order_via_api(self, api, df, supplier, product_lookup, supplier_lookup, admin_fee_value, excel_file=None):
+        """
+        One PO = find/create the order + ONE request with every line.
+        Returns (ok, error, fallback). 'fallback' is True when the Playwright flow can finish
+        the order: nothing was written yet, or the journal knows the PO and which lines are
+        still missing (rejected lines are then resumed in the browser, not the whole order).
+        """
+        po_number_raw = str(df.iloc[0].get("PO Number", "")).strip()
+        is_new_invoice = not po_number_raw or po_number_raw == "PO00000000"
+        lines = self._api_lines(df, supplier, product_lookup, admin_fee_value)
+
+        state = self._start_journal(df, excel_file, supplier, product_lookup, admin_fee_value)
+        if state and state["status"] == "done":
+            print(f"⏭️ Already uploaded according to the journal ({self._journal_key}). Skipping.")
+            return True, None, False
+        if state and state["status"] == "open" and state["po_number"]:
+            # PO a medio subir (p.ej. líneas rechazadas en una corrida anterior): no pasar por el guard de $1000
+            return False, f"PO {state['po_number']} is partially uploaded according to the journal", True
+
+        try:
+            if is_new_invoice:
+                order = api.create_order(supplier_lookup[supplier])
+                print(f"🆕 Created PO {order.get('number')}")
+            else:
+                clean_po_number = po_number_raw.upper().replace("PO", "").strip()
+                try:
+                    po_number = str(int(clean_po_number))
+                except ValueError:
+                    po_number = clean_po_number
+                order = api.find_order(po_number)
+                if order is None:
+                    return False, f"PO {po_number} not found", True
+                total_inc = float(order.get("total_inc") or 0)
+                if total_inc >= 1000.0:
+                    print(f"🛑 Invoice PO {po_number} already uploaded (Total inc. = ${total_inc:,.2f}). Skipping.")
+                    return True, None, False
+        except KountaAPIError as e:
+            return False, str(e), True
+
+        if is_new_invoice:
+            self._journal_open(order.get("number"))
 
-            # Process the single order
-            success = self.process_single_order(page, df, supplier, product_lookup, supplier_lookup, admin_fee_value)
+        try:
+            # replace=True: como en el flujo UI, la línea pre-cargada de una PO existente se descarta
+            result = api.add_lines(order["id"], lines, replace=not is_new_invoice)
+        except KountaAPIError as e:
+            if is_new_invoice:
+                # La PO vacía ya existe: reintentar en el navegador crearía otra, salvo que el journal la retome
+                return False, f"{e} (empty PO {order.get('number')} was created)", self._journal_key is not None
+            return False, str(e), True
+
+        if not is_new_invoice:
+            self._journal_open(order.get("number"))
+
+        # Journal: aceptadas 'done', rechazadas quedan 'pending' para que el navegador las agregue
+        rejected = result["rejected"]
+        rejected_idx = {r["index"] for r in rejected if isinstance(r.get("index"), int) and 0 <= r["index"] < len(lines)}
+        unknown = len(rejected_idx) < len(rejected)
+        for line_no in range(len(lines)):
+            if unknown:
+                # Rechazos sin índice: el navegador busca cada línea en la PO antes de agregarla
+                self._journal_mark(line_no, "adding")
+            elif line_no not in rejected_idx:
+                self._journal_mark(line_no, "done")
+
+        if rejected:
+            names = ", ".join(
+                f"{lines[r['index']]['product_name']} ({r.get('reason', '?')})" if isinstance(r.get("index"), int) and r["index"] < len(lines)
+                else str(r)
+                for r in rejected
+            )
+            error = f"{len(rejected)}/{len(lines)} lines rejected on PO {order.get('number')}: {names}"
+            if self._journal_key is None:
+                # Sin journal el navegador no sabe qué líneas faltan: quedan para agregar a mano
+                return False, f"{error} — add them by hand", False
+            return False, error, True
+
+        if self._journal_key:
+            self.journal.finish_order(self._journal_key)
+        print(f"✅ PO {order.get('number')}: {len(result['accepted'])} lines added in one request")
+        return True, None, False
+
+    def upload_via_api(self, supplier, api_url=None):
+        """
+        Upload every invoice of 'supplier' through the purchase API (no browser).
+        Returns the Excel files that should be retried with the Playwright flow
+        ([] when nothing needs it, None when the API can't be used at all).
+        """
+        loaded = self._load_supplier_data(supplier)
+        if loaded is None:
+            return None
+        input_folder, product_lookup, supplier_lookup = loaded
 
-            # IMPORTANT: do NOT move/delete the file here.
-            if success:
-                print("✅ Order processed successfully (no file move; cleanup handled by caller).")
+        try:
+            api = KountaPurchaseAPI(api_url)
+        except KountaAPIError as e:
+            print(f"⚠️ API backend unavailable: {e}")
+            return None
+        print(f"🌐 Purchase API: {api.base_url}")
+        self.product_index = load_index(api_fetcher(api), base_url=api.base_url)
+
+        excel_files = sorted(f for f in os.listdir(input_folder) if f.lower().endswith(('.xlsx', '.xls')))
+        if not excel_files:
+            print("No Excel files found to process.")
+            return []
 
-            self.random_delay(3, 5)
+        summary = []
+        fallback_files = []
+        for excel_file in excel_files:
+            loaded = self._load_order(os.path.join(input_folder, excel_file), supplier, product_lookup)
+            if loaded is None:
+                summary.append({"file": excel_file, "ok": False, "seconds": 0.0, "error": "missing product codes"})
+                continue
+            df, admin_fee_value = loaded
 
-    def process_single_order(self, page, df, supplier, product_lookup, supplier_lookup, admin_fee_value):
+            print(f"\n📄 Processing: {excel_file}")
+            start = time.perf_counter()
+            ok, error, fallback = self._upload_order_via_api(api, df, supplier, product_lookup, supplier_lookup, admin_fee_value, excel_file)
+            if fallback:
+                print(f"↩️ {excel_file}: {error} → will retry in the browser")
+                fallback_files.append(excel_file)
+                continue
+            summary.append({"file": excel_file, "ok": ok, "seconds": time.perf_counter() - start, "error": error})
+
+        if summary:
+            self.upload_results.extend(summary)
+            self._print_upload_summary(summary)
+        return fallback_files
+
+    # --- Resume journal ----------------------------------------------------------
+    def _start_journal(self, df, excel_file, supplier, product_lookup, admin_fee_value):
+        """Register the invoice in the journal; returns its state ({'status', 'po_number', ...}) or None."""
+        self._journal_key = None
+        if self.journal is None:
+            return None
+        lines = [
+            (str(code).strip(), product_lookup.get(str(code).strip(), ""), int(qty), float(cost))
+            for code, qty, cost in zip(df["Product Code"], df["Order Qty"], df["Total Cost"])
+        ]
+        if supplier == "alm" and admin_fee_value:
+            lines.append(("", "Administration Fee", 1, float(admin_fee_value)))
+        po_number_raw = str(df.iloc[0].get("PO Number", "")).strip()
+        self._journal_key = order_key_for(lines, po_number_raw, file=excel_file or "")
+        return self.journal.start_order(self._journal_key, excel_file, supplier, lines)
+
+    def _journal_mark(self, line_no, status):
+        if self._journal_key:
+            self.journal.mark_line(self._journal_key, line_no, status)
+
+    def _journal_open(self, po_number):
+        if self._journal_key and po_number:
+            self.journal.open_order(self._journal_key, po_number)
+
+    def _line_present(self, page, product_name, occurrence=0) -> bool:
+        """
+        True if the open PO already shows the line item for 'product_name'.
+        'occurrence' = earlier invoice lines with the same name: the PO must show one more than that.
+        """
+        product_line_xpath = f"//div[contains(@class, 'lineInfo')]//span[normalize-space(text())=\"{product_name}\"]"
+        product_lines = page.locator(product_line_xpath)
+        try:
+            product_lines.first.wait_for(state="attached", timeout=3000)
+            return product_lines.count() > occurrence
+        except Exception:
+            return False
+
+    def process_single_order(self, page, df, supplier, product_lookup, supplier_lookup, admin_fee_value, excel_file=None):
         """Procesa una orden individual"""
         try:
             po_number_raw = str(df.iloc[0].get("PO Number", "")).strip()
             is_new_invoice = not po_number_raw or po_number_raw == "PO00000000"
-            
+
+            state = self._start_journal(df, excel_file, supplier, product_lookup, admin_fee_value)
+            if state and state["status"] == "done":
+                print(f"⏭️ Already uploaded according to the journal ({self._journal_key}). Skipping.")
+                return True
+            if state and state["status"] == "open" and state["po_number"]:
+                # Corrida anterior cortada: reabrir la misma PO y seguir desde la primera línea faltante
+                print(f"↪️ Resuming PO {state['po_number']} from the journal")
+                return self.edit_existing_order(page, df, state["po_number"], product_lookup, admin_fee_value, supplier, resume=True)
+
             if is_new_invoice:
                 return self.create_new_order(page, df, supplier, supplier_lookup, product_lookup, admin_fee_value)
             else:
@@ -569,6 +930,7 @@ class KountaLogin:
 
             if new_po_number:
                 print(f"🆕 New invoice created with PO: PO{new_po_number}")
+                self._journal_open(new_po_number)
             else:
                 print("⚠️ New PO Number input found but value was empty or unreadable.")
 
@@ -580,9 +942,11 @@ class KountaLogin:
             print(f"❌ Error while creating new order: {e}")
             return False
     
-    def edit_existing_order(self, page, df, po_number_raw, product_lookup, admin_fee_value, supplier):
+    def edit_existing_order(self, page, df, po_number_raw, product_lookup, admin_fee_value, supplier, resume=False):
         """
         Open an existing purchase order and (optionally) clear any pre-populated line item.
+        With resume=True (PO half-uploaded by a previous run, per the journal) the total check
+        and the line removal are skipped: the lines already there are ours.
 
         Flow (ported from Selenium logic):
         1) Normalize PO number (strip leading 'PO' and leading zeros via int cast)
@@ -664,7 +1028,7 @@ class KountaLogin:
                         cleaned = cleaned.replace(",", ".")
                     total_inc = float(cleaned) if cleaned else 0.0
                     
-                    if total_inc >= 1000.0:
+                    if total_inc >= 1000.0 and not resume:
                         print(f"🛑 Invoice PO {po_number} already uploaded (Total inc. = ${total_inc:,.2f}). Skipping.")
                         return True  # short-circuit: treat as done; upstream sees success and stops work
                 except Exception as e:
@@ -684,6 +1048,9 @@ class KountaLogin:
 
 
 
+            if resume:
+                return self.add_products_and_finalize(page, df, supplier, product_lookup, admin_fee_value)
+
             # 4) Remove pre-loaded product line if present
             try:
                 # The line item container as per your Selenium: //div[contains(@class, 'lineInfo')]
@@ -717,6 +1084,8 @@ class KountaLogin:
             except Exception as e:
                 print(f"ℹ️ No pre-loaded line removed (not found or not clickable): {e}")
 
+            self._journal_open(po_number)
+
             # If you need to apply admin_fee_value or proceed adding items, do it after this point.
             return self.add_products_and_finalize(page, df, supplier, product_lookup, admin_fee_value)
 
@@ -740,7 +1109,10 @@ class KountaLogin:
             * Add 'Administration Fee', set its total price, apply changes
         - Click 'Review Order'
         - Navigate back to https://purchase.kounta.com/purchase#orders
+
+        Returns False if the journal still has unconfirmed lines for this PO.
         """
+        order_ok = True
         try:
             # --- Click the search icon (fallbacks included) ---
             search_clicked = False
@@ -767,7 +1139,10 @@ class KountaLogin:
             admin_fee_added = False
 
             # --- Add products from the dataframe ---
-            for _, row in df.iterrows():
+            line_status = self.journal.line_status(self._journal_key) if self._journal_key else {}
+
+            seen_names = {}  # nombre -> líneas anteriores con ese nombre (para _line_present)
+            for line_no, (_, row) in enumerate(df.iterrows()):
                 product_code = str(row["Product Code"]).strip()
                 quantity = int(row["Order Qty"])
                 total_cost = float(row["Total Cost"])
@@ -776,50 +1151,32 @@ class KountaLogin:
                 if not product_name:
                     print(f"⚠️ Producto no encontrado para código: {product_code}")
                     continue
+                occurrence = seen_names.get(product_name, 0)
+                seen_names[product_name] = occurrence + 1
 
+                # Journal: saltar líneas confirmadas; una línea 'adding' puede haber llegado a la PO
+                status = line_status.get(line_no)
+                if status == "done":
+                    print(f"⏭️ Ya confirmado en una corrida anterior: {product_name}")
+                    continue
                 print(f"🛒 Agregando: {product_name} ({quantity}x)")
+                resumed = status == "adding" and self._line_present(page, product_name, occurrence)
+                self._journal_mark(line_no, "adding")
 
                 try:
-                    # Focus the search input and type the product name, then Enter
-                    search_input = page.locator("input[placeholder='Search for products']").first
-                    search_input.wait_for(state="visible", timeout=8000)
-                    # Clear any previous content
-                    search_input.fill("")
-                    self.random_delay(0.2, 0.5)
-                    search_input.fill(product_name)
-                    self.random_delay(0.2, 0.5)
-                    search_input.press("Enter")
-                    self.random_delay(0.5, 0.9)
-
-                    # Try to click the exact match in the results, quantity times
-                    # Avoid relying on hashed class names: match by exact text
-                    product_option = page.locator(f'//span[normalize-space(text())="{product_name}"]').first
-                    product_option.wait_for(state="visible", timeout=8000)
-
-                    for _ in range(quantity):
-                        try:
-                            product_option.click()
-                            self.random_delay(0.1, 0.25)
-                        except Exception:
-                            product_option.click(force=True)
-                            self.random_delay(0.1, 0.25)
+                    if resumed:
+                        print(f"↪️ '{product_name}' ya está en la PO; solo se corrigen cantidad y precio")
+                        if quantity > 1 and not self.set_line_quantity(page, product_name, quantity):
+                            # Sin cantidad verificada la línea no puede quedar 'done'
+                            self._click_quantity_shortfall(page, product_name, quantity)
+                    else:
+                        self._add_product_line(page, product_name, quantity)
 
                     print(f"✅ Producto agregado {quantity}x: {product_name}")
 
                     # Open the just-added product line in the PO details to edit total cost
-                    product_line_xpath = f"//div[contains(@class, 'lineInfo')]//span[normalize-space(text())=\"{product_name}\"]"
                     try:
-                        product_line = page.locator(product_line_xpath).first
-                        product_line.wait_for(state="visible", timeout=8000)
-                        try:
-                            product_line.scroll_into_view_if_needed(timeout=3000)
-                        except Exception:
-                            pass
-                        try:
-                            product_line.click()
-                        except Exception:
-                            product_line.click(force=True)
-                        self.random_delay(0.3, 0.7)
+                        self._open_product_line(page, product_name)
 
                         # 'Enter total price' input
                         total_input = page.locator("input[placeholder='Enter total price']").first
@@ -846,20 +1203,14 @@ class KountaLogin:
                             print(f"🚨 Atención: '{product_name}' tiene costo invoice ${total_cost}, mayor que el actual (${current_cost})")
 
                         # --- Adjust the total for CUB/LION/COKE (+10%), except specific water SKUs (no tax) ---
-                        # Define the no-tax exceptions by exact product name
-                        NO_TAX_PRODUCTS = {"Mt FRANKLIN 600ml S1", "Mt FRANKLIN 1.5L S1"}
-
-                        adjusted_cost = float(total_cost)
-
-                        # Apply +10% only if supplier is CUB/LION/COKE AND product is not in the no-tax list
-                        if supplier in ["cub", "lion", "coke"] and product_name not in NO_TAX_PRODUCTS:
-                            adjusted_cost = round(adjusted_cost * 1.10, 2)
-
+                        adjusted_cost = self._adjusted_cost(supplier, product_name, total_cost)
 
                         # Open keypad, enter price, confirm and apply
                         ok = self.enter_price_via_keypad(page, total_input, adjusted_cost)
                         if not ok:
                             print(f"⚠️ Keypad flow returned False for '{product_name}'. Continuing.")
+                        else:
+                            self._journal_mark(line_no, "done")
 
 
                     except Exception as e:
@@ -869,42 +1220,48 @@ class KountaLogin:
                     print(f"❌ Error con '{product_name}': {e}")
 
             # --- Admin Fee (ALM) ---
-            if supplier == "alm" and admin_fee_value:
+            admin_line_no = len(df)  # en el journal va después de las líneas de la factura
+            if supplier == "alm" and admin_fee_value and line_status.get(admin_line_no) == "done":
+                print("⏭️ Admin Fee ya confirmado en una corrida anterior")
+            elif supplier == "alm" and admin_fee_value:
                 product_name = "Administration Fee"
                 total_cost = float(admin_fee_value)
                 print(f"➕ Agregando Admin Fee: {product_name} ${total_cost}")
+                resumed = line_status.get(admin_line_no) == "adding" and self._line_present(page, product_name)
+                self._journal_mark(admin_line_no, "adding")
 
                 try:
-                    # 1) Search field (robust: placeholder first, fallback to raw input)
-                    search_input = page.get_by_placeholder("Search for products").first
-                    try:
-                        search_input.wait_for(state="visible", timeout=8000)
-                    except Exception:
-                        search_input = page.locator("input[placeholder='Search for products']").first
-                        search_input.wait_for(state="visible", timeout=8000)
-
-                    # Hard clear (select-all + backspace), then type and search
-                    for _ in range(2):
+                    if not resumed:
+                        # 1) Search field (robust: placeholder first, fallback to raw input)
+                        search_input = page.get_by_placeholder("Search for products").first
                         try:
-                            search_input.press("ControlOrMeta+a")
-                            search_input.press("Backspace")
+                            search_input.wait_for(state="visible", timeout=8000)
                         except Exception:
-                            pass
-                    self.random_delay(0.2, 0.5)
+                            search_input = page.locator("input[placeholder='Search for products']").first
+                            search_input.wait_for(state="visible", timeout=8000)
 
-                    search_input.type(product_name, delay=random.uniform(20, 40))
-                    self.random_delay(0.2, 0.5)
-                    search_input.press("Enter")
-                    self.random_delay(0.5, 0.9)
+                        # Hard clear (select-all + backspace), then type and search
+                        for _ in range(2):
+                            try:
+                                search_input.press("ControlOrMeta+a")
+                                search_input.press("Backspace")
+                            except Exception:
+                                pass
+                        self.random_delay(0.2, 0.5)
 
-                    # 2) Click the exact product option by visible text
-                    admin_option = page.locator(f"//span[normalize-space(text())='{product_name}']").first
-                    admin_option.wait_for(state="visible", timeout=8000)
-                    try:
-                        admin_option.click()
-                    except Exception:
-                        admin_option.click(force=True)
-                    print("✅ Admin Fee agregado.")
+                        self.pacer.type_into(search_input, product_name, 20, 40)
+                        self.random_delay(0.2, 0.5)
+                        search_input.press("Enter")
+                        self.random_delay(0.5, 0.9)
+
+                        # 2) Click the exact product option by visible text
+                        admin_option = page.locator(f"//span[normalize-space(text())='{product_name}']").first
+                        admin_option.wait_for(state="visible", timeout=8000)
+                        try:
+                            admin_option.click()
+                        except Exception:
+                            admin_option.click(force=True)
+                        print("✅ Admin Fee agregado.")
 
                     # 3) Open the line item panel for this product
                     product_line_xpath = f"//div[contains(@class, 'lineInfo')]//span[normalize-space(text())=\"{product_name}\"]"
@@ -948,6 +1305,8 @@ class KountaLogin:
                         ok = self.enter_price_via_keypad(page, total_trigger, float(total_cost))
                         if not ok:
                             print(f"⚠️ Keypad flow returned False for '{product_name}'")
+                        else:
+                            self._journal_mark(admin_line_no, "done")
 
                 except Exception as e:
                     print(f"❌ Error al agregar Admin Fee: {e}")
@@ -961,22 +1320,105 @@ class KountaLogin:
                 except Exception:
                     review_order_button.click(force=True)
                 self.random_delay(0.4, 0.9)
+
+                if self._journal_key:
+                    missing = self.journal.finish_order(self._journal_key)
+                    if missing:
+                        print(f"⚠️ {missing} line(s) not confirmed; re-run to resume this PO from them")
+                        order_ok = False
             except Exception as e:
                 print(f"⚠️ No se pudo clickear 'Review Order': {e}")
 
             # --- Back to orders list ---
             try:
-                page.goto("https://purchase.kounta.com/purchase#orders", wait_until="networkidle")
-                self.random_delay(0.5, 1.0)
+                page.goto(ORDERS_URL, wait_until="networkidle")
+                self.random_delay(0.5, 1.0, page=page)
             except Exception as e:
                 print(f"⚠️ No se pudo volver a la lista de órdenes: {e}")
 
-            return True
+            return order_ok
 
         except Exception as e:
             print(f"❌ Error en add_products_and_finalize: {e}")
             return False
 
+    def _search_product(self, page, product_name):
+        """Type 'product_name' in the product search and return its (visible) exact-match result."""
+        # Focus the search input and type the product name
+        search_input = page.locator("input[placeholder='Search for products']").first
+        self.pacer.wait(search_input, timeout=8000)
+        # Clear any previous content
+        search_input.fill("")
+        self.random_delay(0.2, 0.5)
+        search_input.fill(product_name)
+
+        # Try to click the exact match in the results
+        # Avoid relying on hashed class names: match by exact text
+        product_option = page.locator(f'//span[normalize-space(text())="{product_name}"]').first
+
+        # Nombre confirmado en el índice: un solo filtro dirigido, sin Enter ni espera de red
+        found = False
+        if self._targeted_filter and self.product_index.get(product_name, exact=True):
+            try:
+                self.pacer.wait(product_option, timeout=3000)
+                found = True
+            except Exception:
+                print("ℹ️ Search box doesn't filter while typing; using Enter for the rest of the run")
+                self._targeted_filter = False
+
+        if not found:
+            self.random_delay(0.2, 0.5)
+            search_input.press("Enter")
+            self.random_delay(0.5, 0.9, page=page)
+            self.pacer.wait(product_option, timeout=8000)
+        return product_option
+
+    def _add_product_line(self, page, product_name, quantity: int):
+        """Search 'product_name', add it once and set the line quantity (falls back to clicking the shortfall)."""
+        product_option = self._search_product(page, product_name)
+
+        # Add the product ONCE, then write the quantity into the line item
+        try:
+            product_option.click()
+        except Exception:
+            product_option.click(force=True)
+        self.random_delay(0.1, 0.25)
+
+        if quantity > 1 and not self.set_line_quantity(page, product_name, quantity):
+            self._click_quantity_shortfall(page, product_name, quantity, product_option, just_added=True)
+
+    def _click_quantity_shortfall(self, page, product_name, quantity: int, product_option=None, just_added=False):
+        """
+        Fallback after set_line_quantity failed: the keypad/Apply may already have gone through,
+        so read what the line holds and click the product only for the shortfall.
+
+        A panel without a quantity control was never written to: a line we 'just_added' holds
+        the single click that created it. On a resumed line that can't be verified, so it raises
+        (the journal keeps the line in 'adding').
+        """
+        has_control, current = self._read_line_quantity(page, product_name)
+        if not has_control and just_added:
+            current = 1
+        elif current is None:
+            raise RuntimeError(f"could not read the quantity of '{product_name}' after the failed write; "
+                               f"check the line manually (expected {quantity})")
+        missing = quantity - current
+        if missing < 0:
+            raise RuntimeError(f"'{product_name}' has {current} units on the PO, more than the {quantity} invoiced")
+        if missing == 0:
+            print(f"ℹ️ '{product_name}' already holds {quantity} units")
+            return
+        print(f"↩️ Falling back to {missing} extra clicks for '{product_name}' (line has {current})")
+        if product_option is None:
+            product_option = self._search_product(page, product_name)
+        for _ in range(missing):
+            try:
+                product_option.click()
+                self.random_delay(0.1, 0.25)
+            except Exception:
+                product_option.click(force=True)
+                self.random_delay(0.1, 0.25)
+
     def enter_price_via_keypad(self, page, total_input, adjusted_cost: float):
         """
         Open the numeric keypad, clear any previous value, type the new amount, confirm (OK/Enter),
@@ -994,19 +1436,31 @@ class KountaLogin:
         5) Confirm with OK (#enter) or press Enter
         6) Click 'Apply Changes'
         """
-        import re
-
         # Format amount with 2 decimals; decimal will be mapped to the keypad's available symbol ('.' or ',')
         raw_text = f"{adjusted_cost:.2f}"
 
+        if not self._keypad_type(page, total_input, raw_text):
+            return False
+
+        # 6) Click 'Apply Changes'
+        self._apply_line_changes(page)
+        return True
+
+    def _keypad_type(self, page, trigger, raw_text: str) -> bool:
+        """
+        Steps 1-5 of the keypad flow: open the keypad from 'trigger', clear it, type 'raw_text'
+        and confirm (OK/Enter). Does NOT click 'Apply Changes'.
+        """
+        import re
+
         # 1) Open keypad
         try:
-            total_input.wait_for(state="visible", timeout=8000)
+            trigger.wait_for(state="visible", timeout=8000)
             try:
-                total_input.scroll_into_view_if_needed(timeout=3000)
+                trigger.scroll_into_view_if_needed(timeout=3000)
             except Exception:
                 pass
-            total_input.click()
+            trigger.click()
             self.random_delay(0.15, 0.3)
         except Exception as e:
             print(f"❌ Could not open keypad (click on total_input): {e}")
@@ -1066,7 +1520,7 @@ class KountaLogin:
 
         # Try preferred path: TYPE with the physical keyboard (often works on these overlays)
         try:
-            page.keyboard.type(value_text, delay=random.uniform(25, 45))
+            page.keyboard.type(value_text, delay=self.pacer.keystroke_delay(25, 45))
             self.random_delay(0.15, 0.3)
         except Exception as e:
             print(f"⚠️ Keyboard type failed: {e}")
@@ -1125,8 +1579,10 @@ class KountaLogin:
             page.keyboard.press("Enter")
 
         self.random_delay(0.2, 0.4)
+        return True
 
-        # 6) Click 'Apply Changes'
+    def _apply_line_changes(self, page) -> bool:
+        """Click 'Apply Changes' on the open line item panel."""
         try:
             apply_btn = page.locator("//button[contains(., 'Apply Changes')]").first
             apply_btn.wait_for(state="visible", timeout=6000)
@@ -1135,21 +1591,152 @@ class KountaLogin:
             except Exception:
                 apply_btn.click(force=True)
             self.random_delay(0.25, 0.5)
+            return True
         except Exception as e:
             print(f"⚠️ Could not click 'Apply Changes': {e}")
+            return False
 
-        return True
+    def _open_product_line(self, page, product_name):
+        """Open the line item panel of 'product_name' in the PO details."""
+        product_line_xpath = f"//div[contains(@class, 'lineInfo')]//span[normalize-space(text())=\"{product_name}\"]"
+        product_line = page.locator(product_line_xpath).first
+        product_line.wait_for(state="visible", timeout=8000)
+        try:
+            product_line.scroll_into_view_if_needed(timeout=3000)
+        except Exception:
+            pass
+        try:
+            product_line.click()
+        except Exception:
+            product_line.click(force=True)
+        self.random_delay(0.3, 0.7)
+
+    @staticmethod
+    def _read_control_number(control):
+        """Best-effort read of the numeric value shown by an <input> or keypad trigger."""
+        for read in (lambda: control.input_value(), lambda: control.get_attribute("value"), lambda: control.inner_text()):
+            try:
+                val = read()
+            except Exception:
+                continue
+            if val is None:
+                continue
+            m = re.search(r"-?\d+(?:[.,]\d+)?", str(val))
+            if m:
+                return float(m.group().replace(",", "."))
+        return None
+
+    @staticmethod
+    def _find_quantity_control(page):
+        """Quantity control (real <input> or keypad trigger) of the open line panel, or None."""
+        candidates = [
+            page.get_by_placeholder(re.compile(r"quantity", re.I)),
+            page.locator("input[name*='quantity' i], input[id*='quantity' i]"),
+            page.get_by_label(re.compile(r"^\s*(qty|quantity)\s*$", re.I)),
+            page.locator("xpath=//*[contains(translate(@aria-label,'QUANTITY','quantity'),'quantity')]"),
+        ]
+        for cand in candidates:
+            try:
+                if cand.count() > 0 and cand.first.is_visible():
+                    return cand.first
+            except Exception:
+                continue
+        return None
+
+    def _read_line_quantity(self, page, product_name):
+        """
+        Re-open the line of 'product_name' and read the quantity it holds right now.
+        Returns (has_control, quantity); quantity is None if the control can't be read.
+        Raises if the line itself can't be opened.
+        """
+        try:
+            page.keyboard.press("Escape")
+        except Exception:
+            pass
+        self.random_delay(0.2, 0.4)
+        self._open_product_line(page, product_name)  # si la línea no abre, que falle la línea
+        qty_control = self._find_quantity_control(page)
+        current = self._read_control_number(qty_control) if qty_control is not None else None
+        try:
+            page.keyboard.press("Escape")
+        except Exception:
+            pass
+        return qty_control is not None, (None if current is None else int(round(current)))
+
+    def set_line_quantity(self, page, product_name, quantity: int) -> bool:
+        """
+        Set the quantity of an already-added line directly (one write instead of N clicks).
+
+        Flow:
+        1) Open the line item panel of 'product_name'
+        2) Locate the quantity control (real <input> or keypad trigger)
+        3) Write the quantity (fill, or keypad for React overlays)
+        4) Read the value back; only then click 'Apply Changes'
+
+        Returns False (leaving the panel to be closed by the caller) if the control
+        can't be found or the read-back doesn't match, so the caller can fall back to clicking.
+        """
+        try:
+            self._open_product_line(page, product_name)
+        except Exception as e:
+            print(f"⚠️ Could not open line '{product_name}' to set quantity: {e}")
+            return False
+
+        qty_control = self._find_quantity_control(page)
+        if qty_control is None:
+            print(f"ℹ️ No quantity field found for '{product_name}'")
+            return False
+
+        try:
+            tag = qty_control.evaluate("el => el.tagName.toLowerCase()")
+            editable = tag == "input" and qty_control.is_editable()
+        except Exception:
+            editable = False
+
+        if editable:
+            try:
+                qty_control.fill(str(quantity))
+                qty_control.press("Tab")
+            except Exception as e:
+                print(f"⚠️ Could not fill quantity for '{product_name}': {e}")
+                return False
+        elif not self._keypad_type(page, qty_control, str(quantity)):
+            return False
+
+        # Read-back check before applying
+        read_back = self._read_control_number(qty_control)
+        if read_back is None or int(round(read_back)) != int(quantity):
+            print(f"⚠️ Quantity read-back mismatch for '{product_name}': expected {quantity}, got {read_back}")
+            return False
+
+        return self._apply_line_changes(page)
  
 # Uso del script
 if __name__ == "__main__":
     # Verificar argumentos de línea de comandos
-    if len(sys.argv) != 2:
-        print("❌ Uso: python 4-upload.py <supplier>")
+    valid_suppliers = ["alm", "coke", "cub", "lion"]
+    if len(sys.argv) < 2:
+        print("❌ Uso: python 4-upload.py <supplier> [--pacing stealth|normal|fast] [--workers N] [--backend ui|api] [--no-resume]")
         print("Suppliers disponibles: alm, coke, cub, lion")
         exit(1)
-    
-    supplier = sys.argv[1].lower()
-    valid_suppliers = ["alm", "coke", "cub", "lion"]
+
+    parser = argparse.ArgumentParser(description="Upload parsed invoices to Lightspeed purchase orders")
+    parser.add_argument("supplier", help="alm, coke, cub o lion")
+    parser.add_argument("--pacing", choices=list(PROFILES), default=None,
+                        help="Perfil de pausas (default: LIGHTSPEED_PACING en .env o 'normal')")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Cantidad de órdenes a subir en paralelo (un navegador por worker, default: 1)")
+    parser.add_argument("--backend", choices=["ui", "api"], default="ui",
+                        help="ui: navegador (Playwright); api: todas las líneas de cada PO en un solo request HTTP "
+                             "con lightspeed_cookies.json, con el navegador como fallback")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="No usar el journal (.cache/upload_journal.sqlite): subir cada factura desde cero")
+    parser.add_argument("--api-url", default=None,
+                        help="Base URL del purchase API (default: KOUNTA_PURCHASE_API o https://purchase.kounta.com); "
+                             "p.ej. http://127.0.0.1:8765 con scripts/kounta_stub_server.py")
+    args = parser.parse_args()
+
+    supplier = args.supplier.lower()
     
     if supplier not in valid_suppliers:
         print(f"❌ Supplier '{supplier}' no válido. Usa uno de: {', '.join(valid_suppliers)}")
@@ -1159,7 +1746,7 @@ if __name__ == "__main__":
     load_dotenv(dotenv_path=os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env'))
     
     # Configurar credenciales desde variables de entorno
-    login_bot = KountaLogin()
+    login_bot = KountaLogin(pacing=args.pacing, workers=args.workers, journal=not args.no_resume)
     login_bot.email = os.getenv('LIGHTSPEED_EMAIL')
     login_bot.password = os.getenv('LIGHTSPEED_PASSWORD')
     
@@ -1173,12 +1760,30 @@ if __name__ == "__main__":
     
     print(f"🔐 Usando email: {login_bot.email}")
     print(f"📦 Supplier seleccionado: {supplier.upper()}")
-    
-    
-    # Ejecutar login con el supplier elegido en CLI
-    success = login_bot.login("Bot-Profile", supplier)
-    
+    print(f"⏱️ Pacing profile: {login_bot.pacer.profile.name}")
+    print(f"🔌 Backend: {args.backend}")
+
+    if args.backend == "api":
+        fallback_files = login_bot.upload_via_api(supplier, api_url=args.api_url)
+        if fallback_files == []:
+            success = True
+        else:
+            # None = API no disponible: todas las órdenes por el navegador
+            login_bot.only_files = set(fallback_files) if fallback_files is not None else None
+            print(f"🌐 Falling back to the browser for {len(fallback_files) if fallback_files is not None else 'all'} order(s)")
+            success = login_bot.login("Bot-Profile", supplier)
+    else:
+        # Ejecutar login con el supplier elegido en CLI
+        success = login_bot.login("Bot-Profile", supplier)
+
+    # Una sola orden con ❌ alcanza para que main_gui no limpie las facturas
+    failed = [r["file"] for r in login_bot.upload_results if not r["ok"]]
+    if failed:
+        print(f"❌ {len(failed)} order(s) not uploaded: {', '.join(sorted(failed))}")
+        success = False
+
     if success:
         print("🎉 Proceso completado exitosamente")
     else:
-        print("💥 El proceso falló")
\ No newline at end of file
+        print("💥 El proceso falló")
+        exit(1)
\ No newline at end of file
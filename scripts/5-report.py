@@ -1,68 +1,63 @@
-import re
+import numpy as np
 import pandas as pd
 from rapidfuzz import process, fuzz
+from catalog import load_catalog
+from name_mappings import MappingStore, map_suffix
 
 
-EXCEPTIONS_C30_TO_C1 = {
-    "EMU EXPORT", "EMU BITTER", "IRON JACK MID", "CARLTON DRY", "CARLTON DRY 3.5", "CARLTON MID",
-    "GREAT NORTHERN ORIGINAL", "GREAT NORTHERN 3.5", "VB", "HAHN 3.5", "HAHN SUPER DRY", "XXXX GOLD"
-}
-
-def map_suffix(product_name):
-    name = product_name.strip().upper()
-
-    # Excepción específica para "CORONA S24 (12PK)"
-    if name == "CORONA S24 (12PK)":
-        return "CORONA S12"
-
-    if name.endswith("C30 PK"):
-        base_name = name[:-7].strip()
-        return f"{base_name} C10"
-
-    base_name = re.sub(r'\s+[CS]\d{1,2}$', '', name, flags=re.IGNORECASE)
-    suffix_match = re.search(r'(C|S)(\d{2})$', name)
-
-    if suffix_match:
-        kind = suffix_match.group(1)
-        size = int(suffix_match.group(2))
-
-        if size == 30 and base_name in EXCEPTIONS_C30_TO_C1:
-            return f"{base_name} {kind}1"
-        elif size in {24, 16}:
-            return f"{base_name} {kind}1"
-        elif size in {20, 30}:
-            return f"{base_name} {kind}10"
-
-    return name
-
-def fuzzy_match_products(report_df, products_df):
-    matched = []
+def fuzzy_match_products(report_df, products_df, store=None):
     products_df["Product Name Normalized"] = products_df["Product Name"].str.strip().str.upper()
     product_choices = products_df["Product Name Normalized"].tolist()
 
-    for _, row in report_df.iterrows():
-        name = row["Product Name"]
-        quantity = row["Quantity"]
-        normalized_name = map_suffix(name)
-
-        match, score, idx = process.extractOne(
-            normalized_name, product_choices, scorer=fuzz.token_sort_ratio
-        )
-
-        if score > 85:
-            product_code = products_df.iloc[idx]["Product Code"]
-            supplier = products_df.iloc[idx]["Supplier"]
-
-            matched.append({
-                "Product Code": product_code,
-                "Product Name": name,
-                "Quantity": quantity,
-                "Supplier": supplier
-            })
-        else:
-            print(f"⚠️ No match confiable para: {name} → {normalized_name} (score: {score})")
+    if report_df.empty or not product_choices:
+        return pd.DataFrame(columns=["Product Code", "Product Name", "Quantity", "Supplier"])
+
+    # Un nombre que aparece en varias hojas se puntúa una sola vez
+    normalized = report_df["Product Name"].map(map_suffix)
+    unique_names = normalized.unique().tolist()
+
+    # 1) Asociaciones confirmadas (solo si el código sigue existiendo en el catálogo)
+    resolved = {}
+    if store is not None:
+        catalog_pairs = set(zip(products_df["Supplier"], products_df["Product Code"].astype(str)))
+        for name, (supplier, code) in store.lookup_many(unique_names).items():
+            if (supplier, code) in catalog_pairs:
+                resolved[name] = (code, supplier)
+        if resolved:
+            print(f"📚 {len(resolved)} product(s) resolved from confirmed mappings")
+
+    # 2) El resto: toda la matriz de scores en una sola llamada (usa todos los núcleos)
+    pending = [name for name in unique_names if name not in resolved]
+    learned = []
+    if pending:
+        scores = process.cdist(pending, product_choices, scorer=fuzz.token_sort_ratio, workers=-1)
+        best_idx = scores.argmax(axis=1)
+        best_score = scores[np.arange(len(pending)), best_idx]
+        codes = products_df["Product Code"].to_numpy()
+        suppliers = products_df["Supplier"].to_numpy()
+
+        for name, idx, score in zip(pending, best_idx, best_score):
+            score = round(float(score), 2)
+            if score > 85:
+                resolved[name] = (codes[idx], suppliers[idx])
+                learned.append((name, suppliers[idx], codes[idx], score))
+            else:
+                print(f"⚠️ No match confiable para: {name} (score: {score})")
+
+    # Los matches automáticos quedan como sugerencias: se vuelven a puntuar hasta que se confirmen
+    if store is not None and learned:
+        store.remember_many(learned)
+
+    ok = normalized.isin(resolved.keys())
+    hits = normalized[ok].map(resolved)
 
-    return pd.DataFrame(matched)
+    matched = pd.DataFrame({
+        "Product Code": [code for code, _ in hits],
+        "Product Name": report_df.loc[ok, "Product Name"].to_numpy(),
+        "Quantity": report_df.loc[ok, "Quantity"].to_numpy(),
+        "Supplier": [supplier for _, supplier in hits],
+    })
+    return matched
 
 def load_report(filepath):
     all_data = []
@@ -86,7 +81,7 @@ def load_report(filepath):
     return pd.concat(all_data, ignore_index=True)
 
 def load_products(filepath):
-    sheets = pd.read_excel(filepath, sheet_name=None)
+    sheets = load_catalog(filepath).sheets
     all_products = []
 
     def clean_code(x, supplier):
@@ -131,8 +126,9 @@ report_path = "report.xlsx"
 report_df = load_report(report_path)
 products_df = load_products("products.xlsx")
 
-# Generar archivo final
-final_df = fuzzy_match_products(report_df, products_df)
+# Generar archivo final (consultando primero las asociaciones aprendidas)
+with MappingStore() as mapping_store:
+    final_df = fuzzy_match_products(report_df, products_df, mapping_store)
 
 if final_df.empty:
     print("⚠️ No se encontraron coincidencias. No se generó ningún archivo.")
@@ -1,12 +1,18 @@
 # scripts/pricelist_playwright.py
 from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
 import os
-import time
-import random
 import re
 import json
+import time
+import argparse
+import sys
 import pandas as pd
 from dotenv import load_dotenv
+from catalog import load_catalog
+from pacing import Pacer, PROFILES
+from product_index import ProductIndex, api_fetcher, browser_fetcher, load_index
+from kounta_api import KountaAPIError, KountaPriceListAPI, KountaPurchaseAPI
+from browser_session import BROWSER_ARGS, CONTEXT_OPTIONS, STEALTH_INIT_SCRIPT, attach as attach_session, session_is_logged_in
 
 # =========================
 # Paths & Config (project layout)
@@ -28,6 +34,8 @@ PRICELIST_URL = "https://my.kounta.com/pricelist"
 PRODUCTS_XLSX = os.path.join(PROJECT_ROOT, "assets", "products.xlsx")
 PROMOS_XLSX = os.path.join(PROJECT_ROOT, "bottlemart_promos", "promo_products.xlsx")
 PROMOS_SHEET = "Promocionados"
+RECONCILIATION_XLSX = os.path.join(PROJECT_ROOT, "bottlemart_promos", "pricelist_reconciliation.xlsx")
+SNAPSHOT_DIR = os.path.join(PROJECT_ROOT, ".cache", "pricelists")
 
 # Name for the new price list
 PRICELIST_NAME = "Test"
@@ -39,8 +47,12 @@ PROFILE_DIR = os.path.join(PROJECT_ROOT, "chrome-profiles", "Bot-Profile")
 # =========================
 # Utilities
 # =========================
-def human_delay(a=0.25, b=0.8):
-    time.sleep(random.uniform(a, b))
+# Pausas según el perfil de pacing (LIGHTSPEED_PACING en .env o --pacing)
+PACER = Pacer(os.getenv("LIGHTSPEED_PACING"))
+
+
+def human_delay(a=0.25, b=0.8, page=None):
+    PACER.delay(a, b, page=page)
 
 
 def norm_code(raw: str) -> str:
@@ -59,9 +71,7 @@ def read_products_lookup(products_xlsx: str) -> dict:
         raise FileNotFoundError(f"Missing products file: {products_xlsx}")
 
     code_to_name = {}
-    xls = pd.ExcelFile(products_xlsx)
-    for sheet in xls.sheet_names:
-        df = xls.parse(sheet)
+    for sheet, df in load_catalog(products_xlsx).sheets.items():
         if "Product Code" not in df.columns or "Product Name" not in df.columns:
             continue
         for _, row in df.iterrows():
@@ -109,30 +119,8 @@ def launch_persistent():
     context = p.chromium.launch_persistent_context(
         user_data_dir=PROFILE_DIR,
         headless=False,  # set True if you want to hide the browser window
-        viewport={'width': 1366, 'height': 768},
-        user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        locale='es-ES',
-        timezone_id='Europe/Madrid',
-        extra_http_headers={
-            'Accept-Language': 'es-ES,es;q=0.9,en;q=0.8',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'DNT': '1',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-        },
-        args=[
-            '--no-sandbox',
-            '--disable-blink-features=AutomationControlled',
-            '--disable-web-security',
-            '--disable-features=VizDisplayCompositor',
-            '--disable-dev-shm-usage',
-            '--no-first-run',
-            '--disable-extensions',
-            '--disable-plugins',
-            '--disable-default-apps',
-            '--disable-background-mode'
-        ]
+        args=BROWSER_ARGS,
+        **CONTEXT_OPTIONS,
     )
     return p, context
 
@@ -142,33 +130,22 @@ def human_like_typing(page, selector, text):
     element = page.locator(selector)
     element.click()
     human_delay(0.5, 1)
-    
-    for char in text:
-        element.type(char)
-        time.sleep(random.uniform(0.05, 0.15))
+    PACER.type_chars(element, text)
 
 
-def ensure_logged_in(context):
+def ensure_logged_in(context, shared=False):
     """
-    Reuse session if possible (recent user tile).
+    Reuse session if possible (warm shared browser, or recent user tile).
     Handle full email+password login with human-like typing.
     """
     page = context.new_page()
     
     # Add anti-detection script like in 4-upload.py
-    page.add_init_script("""
-        Object.defineProperty(navigator, 'webdriver', {
-            get: () => undefined,
-        });
-        
-        window.chrome = {
-            runtime: {},
-        };
-        
-        Object.defineProperty(navigator, 'plugins', {
-            get: () => [1, 2, 3, 4, 5],
-        });
-    """)
+    page.add_init_script(STEALTH_INIT_SCRIPT)
+
+    if shared and session_is_logged_in(page, PRICELIST_URL):
+        print("✅ Sesión activa, sin pasar por el login")
+        return page
 
     print("Navegando a la página de login...")
     page.goto("https://my.kounta.com/login", wait_until='networkidle')
@@ -383,7 +360,7 @@ def create_price_list(page, name: str):
     name_input.wait_for(state="visible", timeout=8000)
     name_input.fill("")
     human_delay(0.2, 0.4)
-    name_input.type(name, delay=random.randint(20, 60))
+    PACER.type_into(name_input, name, 20, 60)
 
     create_btn = page.locator('button[type="submit"].btnPrimary')
     create_btn.wait_for(state="visible", timeout=8000)
@@ -402,40 +379,53 @@ def create_price_list(page, name: str):
     print("✅ Price List created.")
 
 
-def fill_products_and_prices(page, matched_rows):
+def fill_products_and_prices(page, matched_rows, index: ProductIndex = None):
     """
     For each product:
-      - Search by exact name
+      - Search by exact name (names in the product index: one targeted filter, no Enter)
       - Wait for the exact match block
       - Fill price in the decimal input
     """
+    index = index or ProductIndex([])
+    targeted = True  # pasa a False si el buscador no filtra sin Enter
+    results = []
     for item in matched_rows:
         name = item["Product Name"]
         price = str(item["Retail Price"]).strip()
+        error = None
         try:
             print(f"🖊️ Typing: {name} -> ${price}")
 
             search = page.locator('input[data-chaminputid="searchInput"]')
-            search.wait_for(state="visible", timeout=10000)
+            PACER.wait(search, timeout=10000)
             search.click()
             human_delay(0.1, 0.3)
             search.fill("")
             human_delay(0.1, 0.3)
-            search.type(name, delay=random.randint(10, 30))
-            search.press("Enter")
-            human_delay(0.8, 1.3)
+            PACER.type_into(search, name, 10, 30)
 
             result = page.locator(
                 f'//div[contains(@class, "Alignment__AlignmentContainer") and normalize-space(text())="{name}"]'
             )
-            result.wait_for(state="visible", timeout=8000)
+            found = False
+            if targeted and index.get(name, exact=True):
+                try:
+                    PACER.wait(result, timeout=3000)
+                    found = True
+                except PlaywrightTimeoutError:
+                    print("ℹ️ Search box doesn't filter while typing; using Enter for the rest of the run")
+                    targeted = False
+            if not found:
+                search.press("Enter")
+                human_delay(0.8, 1.3, page=page)
+                PACER.wait(result, timeout=8000)
             human_delay(0.3, 0.7)
 
             price_input = page.locator('input[data-chaminputid="textInput"][inputmode="decimal"]')
-            price_input.wait_for(state="visible", timeout=8000)
+            PACER.wait(price_input, timeout=8000)
             price_input.fill("")
             human_delay(0.1, 0.2)
-            price_input.type(price, delay=random.randint(15, 40))
+            PACER.type_into(price_input, price, 15, 40)
             human_delay(0.2, 0.4)
 
             print(f"✅ Set price OK: {name} at ${price}")
@@ -443,8 +433,28 @@ def fill_products_and_prices(page, matched_rows):
 
         except PlaywrightTimeoutError as te:
             print(f"❌ Timeout for {name}: {te}")
+            error = f"timeout: {te}"
         except Exception as e:
             print(f"❌ Error for {name}: {e}")
+            error = str(e)
+
+        results.append(_result(
+            item,
+            path="batch→ui" if "Batch Detail" in item else "ui",
+            status="failed" if error else "ok",
+            detail="; ".join(d for d in (item.get("Batch Detail"), error) if d),
+        ))
+    return results
+
+
+def open_existing_price_list(page, name: str):
+    """Open a price list that already exists (created by the batch import) from the Price Lists page."""
+    print(f"📂 Opening Price List: {name}")
+    entry = page.get_by_text(name, exact=True).first
+    entry.wait_for(state="visible", timeout=20000)
+    entry.click()
+    page.wait_for_load_state("networkidle")
+    human_delay(0.6, 1.1)
 
 
 def save_pricelist(page):
@@ -457,6 +467,189 @@ def save_pricelist(page):
     print("✅ Promotions saved.")
 
 
+# =========================
+# Batch / diff modes (price-list API) + reconciliation
+# =========================
+def _result(item, path, status, detail="", change=""):
+    return {
+        "Product Code": item["Product Code"],
+        "Product Name": item["Product Name"],
+        "Retail Price": item["Retail Price"],
+        "Change": change or item.get("Change", ""),
+        "Path": path,
+        "Status": status,
+        "Detail": detail,
+    }
+
+
+def _price_value(raw):
+    try:
+        return round(float(str(raw).replace("$", "").replace(",", "").strip()), 2)
+    except ValueError:
+        return str(raw)  # que lo rechace el servidor y vaya al flujo UI
+
+
+def _name_key(name) -> str:
+    return re.sub(r"\s+", " ", str(name)).strip().casefold()
+
+
+def _connect_price_list(api_url=None):
+    """(api, product index, PRICELIST_NAME list — created if missing), or None if the API can't be used."""
+    try:
+        api = KountaPriceListAPI(api_url)
+        purchase = KountaPurchaseAPI(api_url)
+        index = load_index(api_fetcher(purchase), base_url=purchase.base_url)
+        price_list = api.find_price_list(PRICELIST_NAME) or api.create_price_list(PRICELIST_NAME)
+    except KountaAPIError as e:
+        print(f"⚠️ Price-list API unavailable ({e}); using the UI for every item")
+        return None
+    return api, index, price_list
+
+
+def _push_items(api, index, price_list, rows, path="batch"):
+    """
+    Set the prices of 'rows' in one request.
+    Returns (results, rows_for_ui): rejected rows carry a "Batch Detail" for the UI retry.
+    """
+    if not rows:
+        return [], []
+    items = []
+    for item in rows:
+        indexed = index.get(item["Product Name"])
+        items.append({
+            "product_id": indexed["id"] if indexed else None,
+            "product_name": item["Product Name"],
+            "price": _price_value(item["Retail Price"]),
+        })
+
+    start = time.perf_counter()
+    try:
+        response = api.set_items(price_list["id"], items)
+        rejected = {
+            r["index"]: r.get("reason", "rejected")
+            for r in response["rejected"] if isinstance(r.get("index"), int)
+        }
+    except KountaAPIError as e:
+        # La lista ya existe: todo se reintenta en el navegador sobre esa misma lista
+        print(f"⚠️ Batch request failed ({e}); retrying every item in the UI")
+        rejected = {i: str(e) for i in range(len(rows))}
+
+    results, retry = [], []
+    for i, item in enumerate(rows):
+        if i in rejected:
+            retry.append(dict(item, **{"Batch Detail": f"batch rejected: {rejected[i]}"}))
+        else:
+            results.append(_result(item, path=path, status="ok"))
+    print(
+        f"📦 {len(results)}/{len(rows)} prices accepted in one request "
+        f"({time.perf_counter() - start:.1f}s); {len(retry)} left for the UI"
+    )
+    return results, retry
+
+
+def batch_import_prices(matched_rows, api_url=None):
+    """
+    Send every promo price to PRICELIST_NAME in one request.
+    Returns (results, rows_for_ui), or None if the API can't be used at all (→ full UI flow).
+    """
+    connected = _connect_price_list(api_url)
+    if connected is None:
+        return None
+    return _push_items(*connected, matched_rows)
+
+
+def snapshot_price_list(api, price_list) -> list:
+    """Current live items of the price list, also saved to .cache/pricelists/<name>.json."""
+    items = api.get_items(price_list["id"])
+    safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", str(price_list.get("name") or price_list["id"]))
+    path = os.path.join(SNAPSHOT_DIR, f"{safe_name}.json")
+    try:
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"taken_at": time.strftime("%Y-%m-%d %H:%M:%S"), "price_list": price_list, "items": items}, f, indent=1)
+    except OSError as e:
+        print(f"⚠️ Could not save price-list snapshot: {e}")
+    print(f"📸 Live price list '{price_list.get('name')}': {len(items)} items (snapshot: {path})")
+    return items
+
+
+def diff_price_list(live_items, matched_rows):
+    """
+    Compare the live list with the promo rows (by product name, prices to the cent).
+    Returns (rows_to_set, items_to_remove, unchanged_rows); rows_to_set carry a "Change".
+    """
+    live = {_name_key(i.get("product_name")): i for i in live_items if i.get("product_name")}
+    wanted = {_name_key(r["Product Name"]): r for r in matched_rows}
+
+    to_set, unchanged = [], []
+    for key, row in wanted.items():
+        current = live.get(key)
+        new_price = _price_value(row["Retail Price"])
+        if current is None:
+            to_set.append(dict(row, Change="added"))
+        elif _price_value(current.get("price")) != new_price:
+            to_set.append(dict(row, Change=f"changed ({_price_value(current.get('price'))} → {new_price})"))
+        else:
+            unchanged.append(dict(row, Change="unchanged"))
+    to_remove = [item for key, item in live.items() if key not in wanted]
+    return to_set, to_remove, unchanged
+
+
+def diff_update_prices(matched_rows, api_url=None):
+    """
+    Update PRICELIST_NAME in place: snapshot it, diff it against the promo file and push
+    only added / changed prices (one request) and removed products (one request).
+    Returns (results, rows_for_ui), or None if the API can't be used at all (→ full UI flow).
+    """
+    connected = _connect_price_list(api_url)
+    if connected is None:
+        return None
+    api, index, price_list = connected
+    try:
+        live_items = snapshot_price_list(api, price_list)
+    except KountaAPIError as e:
+        print(f"⚠️ Could not read the live price list ({e}); pushing every price")
+        return _push_items(api, index, price_list, matched_rows)
+
+    to_set, to_remove, unchanged = diff_price_list(live_items, matched_rows)
+    added = sum(1 for r in to_set if r["Change"] == "added")
+    print(f"🔀 Diff: {added} added, {len(to_set) - added} changed, {len(to_remove)} removed, {len(unchanged)} unchanged")
+
+    results = [_result(r, path="diff", status="ok") for r in unchanged]
+    set_results, retry = _push_items(api, index, price_list, to_set, path="diff")
+    results += set_results
+
+    if to_remove:
+        removed_rows = [
+            {"Product Code": "", "Product Name": i.get("product_name"), "Retail Price": i.get("price"), "Change": "removed"}
+            for i in to_remove
+        ]
+        try:
+            api.remove_items(price_list["id"], [
+                {"product_id": i.get("product_id"), "product_name": i.get("product_name")} for i in to_remove
+            ])
+            results += [_result(r, path="diff", status="ok") for r in removed_rows]
+        except KountaAPIError as e:
+            # No hay flujo UI para quitar productos: queda en el reporte para hacerlo a mano
+            results += [_result(r, path="diff", status="failed", detail=f"remove failed: {e}") for r in removed_rows]
+    return results, retry
+
+
+def write_reconciliation(results, path: str = None):
+    """One row per promo product: which path set its price and whether it worked."""
+    path = path or RECONCILIATION_XLSX
+    df = pd.DataFrame(results, columns=["Product Code", "Product Name", "Retail Price", "Change", "Path", "Status", "Detail"])
+    try:
+        df.to_excel(path, index=False)
+    except OSError as e:
+        print(f"⚠️ Could not write reconciliation report: {e}")
+        return
+    ok = int((df["Status"] == "ok").sum())
+    print(f"🧾 Reconciliation: {ok}/{len(df)} prices set → {path}")
+    for _, row in df[df["Status"] != "ok"].iterrows():
+        print(f"- {row['Product Name']} (${row['Retail Price']}): {row['Detail']}")
+
+
 # =========================
 # Matching / Unmatched
 # =========================
@@ -497,7 +690,8 @@ def build_matched_rows(products_lookup: dict, promos_df: pd.DataFrame):
 # =========================
 # Main
 # =========================
-def main():
+def main(mode="ui", api_url=None):
+    """Returns True only if every promo price ended up set (no failed or rejected row)."""
     # 1) Data
     print("🔧 Reading Excel sources…")
     products_lookup = read_products_lookup(PRODUCTS_XLSX)
@@ -505,31 +699,106 @@ def main():
     matched_rows = build_matched_rows(products_lookup, promos_df)
     print(f"📦 Total matched: {len(matched_rows)}")
 
-    # 2) Browser & login
-    p, context = launch_persistent()
-    try:
-        page = ensure_logged_in(context)
+    # 2) Batch / diff: por API en uno o dos requests; el navegador solo para lo rechazado
+    results, pending, list_exists = [], matched_rows, False
+    if mode in ("batch", "diff"):
+        pushed = batch_import_prices(matched_rows, api_url) if mode == "batch" else diff_update_prices(matched_rows, api_url)
+        if pushed is not None:
+            results, pending = pushed
+            list_exists = True
+
+    if pending:
+        results += upload_via_ui(pending, list_exists)
+
+    write_reconciliation(results)
+    return all(r["Status"] == "ok" for r in results)
 
-        # 3) Go to Price Lists and create + fill
+
+def upload_via_ui(rows, list_exists=False):
+    """Browser flow: log in, open/create the price list, type every price, save."""
+    p = context = page = None
+    shared = False
+    results = []
+    try:
+        # Browser & login (sesión compartida de browser_session.py si está corriendo)
+        p = sync_playwright().start()
+        context = attach_session(p)
+        shared = context is not None
+        if not shared:
+            p.stop()
+            p, context = launch_persistent()
+        page = ensure_logged_in(context, shared=shared)
+
+        # Lista de productos de Lightspeed (una vez por sesión): avisar nombres desconocidos antes de empezar
+        index = load_index(browser_fetcher(context))
+        unknown = index.missing(item["Product Name"] for item in rows)
+        if unknown:
+            print("\n⚠️ Not in the Lightspeed product list (check the patched names):")
+            for name in unknown:
+                print(f"- {name}")
+
+        # Go to Price Lists and create (or open) + fill
         open_pricelist(page)
-        create_price_list(page, PRICELIST_NAME)
-        fill_products_and_prices(page, matched_rows)
+        if list_exists:
+            open_existing_price_list(page, PRICELIST_NAME)
+        else:
+            create_price_list(page, PRICELIST_NAME)
+        results = fill_products_and_prices(page, rows, index)
         save_pricelist(page)
 
+    except Exception as e:
+        print(f"❌ UI flow stopped: {e}")
+        # Precios tipeados pero sin guardar: no quedaron en la lista
+        results = [
+            dict(r, Status="failed", Detail="; ".join(d for d in (r["Detail"], f"price list not saved: {e}") if d))
+            if r["Status"] == "ok" else r
+            for r in results
+        ]
+        done = {r["Product Name"] for r in results}
+        results += [
+            _result(item, path="batch→ui" if "Batch Detail" in item else "ui", status="failed",
+                    detail="; ".join(d for d in (item.get("Batch Detail"), f"not reached: {e}") if d))
+            for item in rows if item["Product Name"] not in done
+        ]
     finally:
         try:
-            for pg in context.pages:
-                try:
-                    pg.close()
-                except Exception:
-                    pass
-            context.close()
+            if shared:
+                # El contexto compartido queda abierto para la próxima corrida
+                if page is not None:
+                    page.close()
+            elif context is not None:
+                for pg in context.pages:
+                    try:
+                        pg.close()
+                    except Exception:
+                        pass
+                context.close()
         except Exception as e:
             print(f"⚠️ Error closing context: {e}")
-        p.stop()
+        if p is not None:
+            p.stop()
+        print(PACER.summary())
+    return results
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upload Bottlemart promo prices to a Lightspeed price list")
+    parser.add_argument("--pacing", choices=list(PROFILES), default=None,
+                        help="Perfil de pausas (default: LIGHTSPEED_PACING en .env o 'normal')")
+    parser.add_argument("--mode", choices=["ui", "batch", "diff"], default="ui",
+                        help="ui: un producto a la vez en el navegador; batch: toda la lista en un request "
+                             "(lightspeed_cookies.json), el navegador solo para las filas rechazadas; "
+                             "diff: comparar con la lista publicada y mandar solo altas, bajas y cambios de precio")
+    parser.add_argument("--api-url", default=None,
+                        help="Base URL de la API (default: KOUNTA_BACKOFFICE_API o https://my.kounta.com); "
+                             "p.ej. http://127.0.0.1:8765 con scripts/kounta_stub_server.py")
+    args = parser.parse_args()
+    if args.pacing:
+        PACER = Pacer(args.pacing)
+    print(f"⏱️ Pacing profile: {PACER.profile.name}")
+
     if not EMAIL or not PASSWORD:
         print("⚠️ LIGHTSPEED_EMAIL or LIGHTSPEED_PASSWORD missing in .env (will still try to reuse a saved session).")
-    main()
+    if not main(args.mode, args.api_url):
+        print("💥 Some promo prices were not set (see the reconciliation report)")
+        sys.exit(1)
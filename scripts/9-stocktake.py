@@ -1,18 +1,54 @@
 from __future__ import annotations
 import argparse
+import hashlib
+import sqlite3
+import time
+from datetime import datetime
 from pathlib import Path
 import pandas as pd
 from decimal import Decimal, InvalidOperation
 import math
-
-# --- Args obligatorios (no hay defaults ni rutas fijas) ----------------------
+import numpy as np
+
+SESSION_EPILOG = """
+Sesión en vivo (conteo de varias horas con varios scanners):
+  python scripts/9-stocktake.py --session stocktake/live.sqlite --products stocktake/products.csv --outdir stocktake/out \
+      --variance stocktake/product-export_2025-08-12_135913.csv [--onhand stock_on_hand.csv]
+  python scripts/9-stocktake.py --session stocktake/live.sqlite --add export_device3.xlsx export_device4.csv
+  python scripts/9-stocktake.py --session stocktake/live.sqlite --watch stocktake/incoming
+  python scripts/9-stocktake.py --session stocktake/live.sqlite --report | --status | --reset
+"""
+
+# --- Args (sin defaults ni rutas fijas) --------------------------------------
 def _parse_args() -> argparse.Namespace:
-    p = argparse.ArgumentParser(add_help=True, description="Stocktake simple (dos scanners + products).")
-    p.add_argument("--scanner1", required=True, help="Ruta a scanner1 (xlsx/csv)")
-    p.add_argument("--scanner2", required=True, help="Ruta a scanner2 (xlsx/csv)")
-    p.add_argument("--products", required=True, help="Ruta a products (csv/xlsx)")
-    p.add_argument("--outdir",   required=True, help="Directorio de salida")
-    return p.parse_args()
+    p = argparse.ArgumentParser(add_help=True, description="Stocktake simple (scanners + products).",
+                                epilog=SESSION_EPILOG, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--scanner1", help="Ruta a scanner1 (xlsx/csv)")
+    p.add_argument("--scanner2", help="Ruta a scanner2 (xlsx/csv)")
+    p.add_argument("--scanners", nargs="+", default=[], metavar="SCANNER_FILE",
+                   help="Más exports de scanner (cualquier cantidad), además de --scanner1/--scanner2")
+    p.add_argument("--chunksize", type=int, default=SCANNER_CHUNKSIZE,
+                   help=f"Filas por bloque al leer CSV grandes (default: {SCANNER_CHUNKSIZE})")
+    p.add_argument("--products", help="Ruta a products (csv/xlsx); en modo sesión queda guardada")
+    p.add_argument("--outdir",   help="Directorio de salida; en modo sesión queda guardado")
+    p.add_argument("--variance", metavar="PRODUCT_EXPORT",
+                   help="Export de Lightspeed (stocktake/product-export_*.csv) para calcular diferencias contra el stock; "
+                        "en modo sesión queda guardado")
+    p.add_argument("--onhand", metavar="FILE",
+                   help="Stock on-hand (csv/xlsx con ProductID o barcode + cantidad) si el export no trae esa columna")
+    g = p.add_argument_group("sesión en vivo")
+    g.add_argument("--session", help="Archivo SQLite con los conteos acumulados (se crea si no existe)")
+    g.add_argument("--add", nargs="+", default=[], metavar="SCANNER_FILE",
+                   help="Exports de scanner a sumar a la sesión (cualquier cantidad; un mismo archivo no se suma dos veces)")
+    g.add_argument("--watch", metavar="DIR", help="Sumar cada export nuevo que aparezca en DIR hasta Ctrl+C")
+    g.add_argument("--interval", type=float, default=5.0, help="Segundos entre revisiones de --watch (default: 5)")
+    g.add_argument("--report", action="store_true", help="Regenerar final_count.csv / unmatched_barcodes.xlsx desde la sesión")
+    g.add_argument("--status", action="store_true", help="Mostrar archivos sumados y totales de la sesión")
+    g.add_argument("--reset", action="store_true", help="Vaciar la sesión antes de cualquier otra acción")
+    args = p.parse_args()
+    if not args.session and not (any((args.scanner1, args.scanner2, args.scanners)) and args.products and args.outdir):
+        p.error("sin --session hacen falta al menos un scanner (--scanner1/--scanner2/--scanners), --products y --outdir")
+    return args
 
 # --- Heurísticas mínimas de columnas ----------------------------------------
 BARCODE_CANDS = ["barcode", "bar code", "code", "ean", "upc", "codigo", "código"]
@@ -57,67 +93,72 @@ def _clean_barcode(x) -> str:
     s = "".join(ch for ch in s if ch.isdigit())
     return s
 
-def _load_scanner(path: Path) -> pd.DataFrame:
-    # 1) Lectura inicial con header por defecto
-    if path.suffix.lower() in (".xlsx", ".xls"):
-        df = pd.read_excel(path)
-    elif path.suffix.lower() == ".csv":
-        df = pd.read_csv(path)
-    else:
-        raise ValueError(f"Formato no soportado para scanner: {path.suffix}")
+def _clean_barcodes(values: pd.Series) -> pd.Series:
+    # Camino rápido: celdas que ya son solo dígitos; el resto pasa por _clean_barcode
+    s = values.astype("string").str.strip().str.replace(",", "", regex=False)
+    digits = s.str.fullmatch(r"\d+").fillna(False).astype(bool)
+    out = s.where(digits, "").astype(object)
+    if (~digits).any():
+        out[~digits] = values[~digits].map(_clean_barcode)
+    return out
 
-    # Normalizar headers a str
-    df.columns = [str(c).strip() if c is not None else "" for c in df.columns]
 
-    # Si está vacío, devolvemos esquema
-    if df.empty:
-        return pd.DataFrame(columns=["barcode", "count"])
+SCANNER_CHUNKSIZE = 200_000
 
-    # Intento normal (con headers)
-    bcol = _find_col(df, BARCODE_CANDS)
-    ccol = _find_col(df, COUNT_CANDS) if bcol else None
-
-    # 2) Fallback: si NO encontramos la columna de barcode,
-    # es probable que el archivo NO tenga encabezados y la primera fila haya quedado como header.
-    if not bcol:
-        # Releer sin encabezados
-        if path.suffix.lower() in (".xlsx", ".xls"):
-            df = pd.read_excel(path, header=None)
-        else:  # csv
-            df = pd.read_csv(path, header=None)
-
-        # Asignar nombres mínimos según cantidad de columnas
-        if df.shape[1] >= 2:
-            df = df.iloc[:, :2].copy()
-            df.columns = ["barcode", "count"]
-        else:
-            df.columns = ["barcode"]
-
-        # Limpiar códigos
-        df["barcode"] = df["barcode"].map(_clean_barcode)
-        df = df[df["barcode"] != ""]
 
-        # Conteo: si hay 'count' la normalizamos; si no, asumimos 1 por fila
-        if "count" in df.columns:
-            df["count"] = pd.to_numeric(df["count"], errors="coerce").fillna(0).astype(int)
-            agg = df.groupby("barcode", as_index=False)["count"].sum()
-        else:
-            df["_u"] = 1
-            agg = df.groupby("barcode", as_index=False)["_u"].sum().rename(columns={"_u": "count"})
+def _iter_raw(path: Path, chunksize: int):
+    """Filas crudas del archivo, todo como texto y sin encabezado (CSV en bloques de 'chunksize')."""
+    suffix = path.suffix.lower()
+    if suffix in (".xlsx", ".xls"):
+        yield pd.read_excel(path, header=None, dtype=str)
+    elif suffix == ".csv":
+        yield from pd.read_csv(path, header=None, dtype=str, chunksize=chunksize)
+    else:
+        raise ValueError(f"Formato no soportado para scanner: {path.suffix}")
 
-        return agg
 
-    # 3) Camino normal (sí encontramos barcode en la primera lectura)
-    df[bcol] = df[bcol].map(_clean_barcode)
-    df = df[df[bcol] != ""]
-    if ccol:
-        df[ccol] = pd.to_numeric(df[ccol], errors="coerce").fillna(0).astype(int)
-        agg = df.groupby(bcol, as_index=False)[ccol].sum().rename(columns={bcol: "barcode", ccol: "count"})
-    else:
-        df["_u"] = 1
-        agg = df.groupby(bcol, as_index=False)["_u"].sum().rename(columns={bcol: "barcode", "_u": "count"})
+def _sniff_columns(first_row: list) -> tuple[bool, int, int | None]:
+    """
+    (tiene_encabezado, col_barcode, col_count) a partir de la primera fila.
+    Si la primera fila nombra una columna de barcode es el encabezado; si no, el archivo
+    viene sin encabezados: barcode en la columna 0 y count en la 1 (si existe).
+    """
+    names = ["" if (c is None or (isinstance(c, float) and math.isnan(c))) else str(c).strip() for c in first_row]
+    header = pd.DataFrame(columns=range(len(names)))
+    header.columns = names
+    bcol = _find_col(header, BARCODE_CANDS)
+    if bcol:
+        ccol = _find_col(header, COUNT_CANDS)
+        return True, names.index(bcol), (names.index(ccol) if ccol else None)
+    return False, 0, (1 if len(names) >= 2 else None)
+
+
+def _load_scanner(path: Path, chunksize: int = SCANNER_CHUNKSIZE) -> pd.DataFrame:
+    # Una sola lectura: se detecta el encabezado en memoria con la primera fila
+    parts = []
+    layout = None
+    for chunk in _iter_raw(path, chunksize):
+        if chunk.empty:
+            continue
+        if layout is None:
+            layout = _sniff_columns(chunk.iloc[0].tolist())
+            if layout[0]:
+                chunk = chunk.iloc[1:]
+        _, bidx, cidx = layout
+
+        bar = _clean_barcodes(chunk.iloc[:, bidx])
+        if cidx is not None:
+            cnt = pd.to_numeric(chunk.iloc[:, cidx], errors="coerce").fillna(0).astype(int)
+        else:
+            cnt = pd.Series(1, index=chunk.index)  # sin columna de conteo: 1 por fila
+        part = pd.DataFrame({"barcode": bar, "count": cnt})
+        part = part[part["barcode"] != ""]
+        parts.append(part.groupby("barcode", as_index=False)["count"].sum())
 
-    return agg
+    if not parts:
+        return pd.DataFrame(columns=["barcode", "count"])
+    agg = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+    return agg.groupby("barcode", as_index=False)["count"].sum()
 
 def _load_products(path: Path) -> pd.DataFrame:
     # Leer como texto para preservar EAN largos y evitar notación científica
@@ -161,7 +202,25 @@ def _load_products(path: Path) -> pd.DataFrame:
     return out[["ProductID", "ProductName", "Barcode"]]
 
 
-def _match(scans: pd.DataFrame, products: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+def _build_suffix_index(products: pd.DataFrame) -> dict[str, int]:
+    """
+    Sufijo de barcode -> posición (fila) del producto para el fallback por sufijo.
+    Si varios barcodes terminan igual gana el más largo (empate: el primero), igual que antes.
+    Se arma una vez por archivo de products; cada scan truncado se resuelve con un lookup.
+    """
+    index: dict[str, int] = {}
+    lengths: dict[int, int] = {}
+    for pos, bc in enumerate(products["Barcode"].astype(str)):
+        lengths[pos] = len(bc)
+        for k in range(len(bc)):
+            cur = index.get(bc[k:])
+            if cur is None or len(bc) > lengths[cur]:
+                index[bc[k:]] = pos
+    return index
+
+
+def _match(scans: pd.DataFrame, products: pd.DataFrame,
+           suffix_index: dict[str, int] | None = None) -> tuple[pd.DataFrame, pd.DataFrame]:
     # Match exacto
     exact = scans.merge(products, left_on="barcode", right_on="Barcode", how="left")
     matched = exact.dropna(subset=["ProductID"])[["ProductID","ProductName","count"]]
@@ -169,23 +228,23 @@ def _match(scans: pd.DataFrame, products: pd.DataFrame) -> tuple[pd.DataFrame, p
     # Pendientes para sufijo
     pend = exact[exact["ProductID"].isna()][["barcode","count"]]
     if not pend.empty:
-        pro = products.copy()
-        rows=[]
-        un=[]
-        for _,r in pend.iterrows():
-            b=str(r["barcode"]); c=int(r["count"])
-            cand = pro[pro["Barcode"].astype(str).str.endswith(b)]
-            if len(cand)==1:
-                pr=cand.iloc[0]
-                rows.append({"ProductID":pr["ProductID"],"ProductName":pr["ProductName"],"count":c})
-            elif len(cand)>1:
-                pr=cand.iloc[cand["Barcode"].str.len().argmax()]
-                rows.append({"ProductID":pr["ProductID"],"ProductName":pr["ProductName"],"count":c})
-            else:
-                un.append({"scanned_barcode":b,"count":c})
-        if rows:
-            matched = pd.concat([matched, pd.DataFrame(rows)], ignore_index=True)
-        unmatched = pd.DataFrame(un)
+        if suffix_index is None:
+            suffix_index = _build_suffix_index(products)
+        barcodes = pend["barcode"].astype(str)
+        pos = barcodes.map(suffix_index)
+        hit = pos.notna()
+        if hit.any():
+            found = products.iloc[pos[hit].astype(int).to_numpy()]
+            rows = pd.DataFrame({
+                "ProductID": found["ProductID"].to_numpy(),
+                "ProductName": found["ProductName"].to_numpy(),
+                "count": pend.loc[hit, "count"].astype(int).to_numpy(),
+            })
+            matched = pd.concat([matched, rows], ignore_index=True)
+        unmatched = pd.DataFrame({
+            "scanned_barcode": barcodes[~hit].to_numpy(),
+            "count": pend.loc[~hit, "count"].astype(int).to_numpy(),
+        })
     else:
         unmatched = pd.DataFrame(columns=["scanned_barcode","count"])
 
@@ -195,24 +254,164 @@ def _match(scans: pd.DataFrame, products: pd.DataFrame) -> tuple[pd.DataFrame, p
         matched = matched.sort_values(["ProductName","ProductID"])
     return matched, unmatched
 
-def main() -> int:
-    args = _parse_args()
-    sc1 = Path(args.scanner1); sc2 = Path(args.scanner2); pr = Path(args.products)
-    outdir = Path(args.outdir); outdir.mkdir(parents=True, exist_ok=True)
+# --- Variance contra el stock de Lightspeed -----------------------------------
+ID_CANDS       = ["productid", "id", "product id", "lightspeed id", "ls_id"]
+COST_CANDS     = ["costpriceinctax", "cost price", "costprice", "unit cost", "cost"]
+CATEGORY_CANDS = ["categorynames", "category", "categoria", "categoría"]
+ONHAND_CANDS   = ["onhand", "on hand", "stock on hand", "soh", "qty on hand", "instock", "in stock", "stock", "quantity"]
+NO_CATEGORY    = "(sin categoría)"
 
-    s1 = _load_scanner(sc1)
-    s2 = _load_scanner(sc2)
-    scans = pd.concat([s1,s2], ignore_index=True)
-    scans = scans.groupby("barcode", as_index=False)["count"].sum()
-
-    products = _load_products(pr)
-    matched, unmatched = _match(scans, products)
 
+def _read_table(path: Path) -> pd.DataFrame:
+    if path.suffix.lower() == ".csv":
+        df = pd.read_csv(path, dtype=str)
+    elif path.suffix.lower() in (".xlsx", ".xls"):
+        df = pd.read_excel(path, dtype=str)
+    else:
+        raise ValueError(f"Formato no soportado: {path.suffix}")
+    df.columns = [str(c).strip() if c is not None else "" for c in df.columns]
+    return df
+
+
+def _load_inventory(path: Path, onhand_path: Path | None = None) -> pd.DataFrame:
+    """
+    Export de Lightspeed → ProductID, ProductName, Barcode, Category, UnitCost, Expected.
+    Expected sale de la columna on-hand del export o de 'onhand_path'; si no hay ninguna, 0.
+    """
+    df = _read_table(path)
+    icol = _find_col(df, ID_CANDS)
+    if not icol:
+        raise ValueError("Export: falta columna de ProductID.")
+    ncol = _find_col(df, ["productname", "name", "product", "description", "descripcion"])
+    bcol = _find_col(df, BARCODE_CANDS)
+    ccol = _find_col(df, COST_CANDS)
+    kcol = _find_col(df, CATEGORY_CANDS)
+    hcol = _find_col(df, ONHAND_CANDS)
+
+    inv = pd.DataFrame({
+        "ProductID": df[icol].astype(str).str.strip(),
+        "ProductName": df[ncol].astype(str).str.strip() if ncol else "",
+        "Barcode": _clean_barcodes(df[bcol]) if bcol else "",
+        "Category": df[kcol].fillna("").astype(str).str.strip().replace("", NO_CATEGORY) if kcol else NO_CATEGORY,
+        "UnitCost": pd.to_numeric(df[ccol], errors="coerce") if ccol else np.nan,
+        "Expected": pd.to_numeric(df[hcol], errors="coerce").fillna(0) if hcol else 0.0,
+    })
+    inv = inv[inv["ProductID"] != ""].drop_duplicates(subset=["ProductID"], keep="first").reset_index(drop=True)
+
+    if onhand_path is not None:
+        oh = _read_table(onhand_path)
+        oh_qty = _find_col(oh, ONHAND_CANDS)
+        oh_id, oh_bar = _find_col(oh, ID_CANDS), _find_col(oh, BARCODE_CANDS)
+        if not oh_qty or not (oh_id or oh_bar):
+            raise ValueError("On-hand: hacen falta ProductID o barcode y una columna de cantidad.")
+        qty = pd.to_numeric(oh[oh_qty], errors="coerce").fillna(0).to_numpy()
+        if oh_id:
+            pos = pd.Index(inv["ProductID"]).get_indexer(oh[oh_id].astype(str).str.strip())
+        else:
+            pos = _barcode_positions(inv, _clean_barcodes(oh[oh_bar]))
+        expected = np.zeros(len(inv))
+        np.add.at(expected, pos[pos >= 0], qty[pos >= 0])
+        inv["Expected"] = expected
+        if (pos < 0).any():
+            print(f"⚠️ On-hand: {(pos < 0).sum()} filas sin producto en el export")
+    elif not hcol:
+        print("⚠️ El export no trae stock on-hand (usar --onhand): Expected = 0, la diferencia es lo contado")
+    return inv
+
+
+def _barcode_positions(inv: pd.DataFrame, barcodes: pd.Series) -> np.ndarray:
+    """Posición en 'inv' de cada barcode (-1 si no está), con un índice hash sobre los barcodes del export."""
+    with_bar = inv[inv["Barcode"] != ""].drop_duplicates(subset=["Barcode"], keep="first")
+    found = pd.Index(with_bar["Barcode"]).get_indexer(barcodes.astype(str))
+    return np.where(found >= 0, with_bar.index.to_numpy()[found], -1)
+
+
+def _variance(matched: pd.DataFrame, products: pd.DataFrame,
+              inventory: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Cruza lo contado con el export (ProductID; si no está, el barcode del producto) con índices hash.
+    Devuelve (por SKU, por categoría, discrepancias ordenadas por valor a costo).
+    """
+    ids = matched["ProductID"].astype(str).str.strip()
+    pos = pd.Index(inventory["ProductID"]).get_indexer(ids)
+    missing = pos < 0
+    if missing.any():
+        first = products.drop_duplicates(subset=["ProductID"])
+        first_bar = pd.Series(first["Barcode"].to_numpy(), index=first["ProductID"].astype(str))
+        bars = ids[missing].map(first_bar).fillna("")
+        pos[missing] = _barcode_positions(inventory, bars)
+        missing = pos < 0
+
+    counts = matched["count"].to_numpy(dtype=float)
+    counted = np.bincount(pos[~missing], weights=counts[~missing], minlength=len(inventory))
+
+    sku = inventory.copy()
+    sku["Counted"] = counted
+    sku = sku[(sku["Counted"] != 0) | (sku["Expected"] != 0)]
+    if missing.any():
+        # Contado pero no está en el export: queda en el reporte para revisar a mano
+        extra = pd.DataFrame({
+            "ProductID": ids[missing].to_numpy(),
+            "ProductName": matched.loc[missing, "ProductName"].to_numpy(),
+            "Barcode": "",
+            "Category": "(no está en el export)",
+            "UnitCost": np.nan,
+            "Expected": 0.0,
+            "Counted": counts[missing],
+        })
+        sku = pd.concat([sku, extra], ignore_index=True)
+
+    sku["Variance"] = sku["Counted"] - sku["Expected"]
+    sku["ExpectedValue"] = sku["Expected"] * sku["UnitCost"]
+    sku["CountedValue"] = sku["Counted"] * sku["UnitCost"]
+    sku["VarianceValue"] = sku["Variance"] * sku["UnitCost"]
+    sku = sku[["ProductID", "ProductName", "Barcode", "Category", "UnitCost",
+               "Expected", "Counted", "Variance", "ExpectedValue", "CountedValue", "VarianceValue"]]
+
+    by_cat = (
+        sku.groupby("Category", as_index=False)
+        .agg(SKUs=("ProductID", "size"), Expected=("Expected", "sum"), Counted=("Counted", "sum"),
+             Variance=("Variance", "sum"), ExpectedValue=("ExpectedValue", "sum"),
+             CountedValue=("CountedValue", "sum"), VarianceValue=("VarianceValue", "sum"))
+    )
+    by_cat = by_cat.iloc[by_cat["VarianceValue"].abs().argsort()[::-1]].reset_index(drop=True)
+
+    disc = sku[sku["Variance"] != 0].copy()
+    disc["_abs_value"] = disc["VarianceValue"].abs()
+    disc["_abs_units"] = disc["Variance"].abs()
+    disc = disc.sort_values(["_abs_value", "_abs_units"], ascending=False, na_position="last")
+    disc = disc.drop(columns=["_abs_value", "_abs_units"]).reset_index(drop=True)
+    disc.insert(0, "Rank", range(1, len(disc) + 1))
+    return sku.sort_values(["Category", "ProductName"]).reset_index(drop=True), by_cat, disc
+
+
+def _write_variance(matched: pd.DataFrame, products: pd.DataFrame, export_path: Path,
+                    outdir: Path, onhand_path: Path | None = None) -> None:
+    start = time.perf_counter()
+    inventory = _load_inventory(export_path, onhand_path)
+    sku, by_cat, disc = _variance(matched, products, inventory)
+    elapsed = time.perf_counter() - start
+
+    sku_out = outdir / "variance_by_sku.csv"
+    report_out = outdir / "variance_report.xlsx"
+    sku.to_csv(sku_out, index=False)
+    disc_sheet = disc.copy()
+    disc_sheet["Barcode"] = disc_sheet["Barcode"].astype(str)  # barcode como TEXTO en Excel
+    with pd.ExcelWriter(report_out) as xw:  # requiere openpyxl instalado
+        disc_sheet.to_excel(xw, sheet_name="Discrepancies", index=False)
+        by_cat.to_excel(xw, sheet_name="By category", index=False)
+    print(f"📉 variance: {len(disc)} SKUs con diferencia, "
+          f"${sku['VarianceValue'].sum():,.2f} a costo ({len(inventory)} filas del export en {elapsed:.2f}s)")
+    print(f"📄 variance report: {report_out}")
+
+
+# --- Salida -------------------------------------------------------------------
+def _write_outputs(matched: pd.DataFrame, unmatched: pd.DataFrame, outdir: Path) -> None:
     final_out = outdir / "final_count.csv"
     matched.to_csv(final_out, index=False)
 
+    unmatched_out = outdir / "unmatched_barcodes.xlsx"
     if not unmatched.empty:
-        unmatched_out = outdir / "unmatched_barcodes.xlsx"
         # Asegurar que el barcode quede como TEXTO en Excel (evita 1.23E+13)
         unmatched = unmatched.copy()
         unmatched["scanned_barcode"] = unmatched["scanned_barcode"].astype(str)
@@ -221,9 +420,245 @@ def main() -> int:
         print(f"✅ final_count: {final_out}")
         print(f"📄 unmatched barcodes:   {unmatched_out}")
     else:
+        if unmatched_out.exists():
+            unmatched_out.unlink()  # de un reporte anterior de la sesión
         print(f"✅ final_count: {final_out}")
         print("🎉 No unmatched barcodes.")
 
+
+# --- Sesión en vivo -----------------------------------------------------------
+_SESSION_SCHEMA = """
+CREATE TABLE IF NOT EXISTS counts (
+    barcode TEXT PRIMARY KEY,
+    count   INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    path     TEXT PRIMARY KEY,
+    sha1     TEXT NOT NULL,
+    barcodes INTEGER NOT NULL,
+    units    INTEGER NOT NULL,
+    added_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS file_counts (
+    path    TEXT NOT NULL,
+    barcode TEXT NOT NULL,
+    count   INTEGER NOT NULL,
+    PRIMARY KEY (path, barcode)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class StocktakeSession:
+    """
+    Conteos acumulados por barcode en SQLite. Cada export se agrega una sola vez
+    (por ruta y contenido) sumando sus totales por barcode: O(tamaño del archivo), sin
+    releer los anteriores. Los reportes salen de la tabla de conteos.
+
+    Los totales de cada archivo se guardan por ruta (file_counts): un export que el
+    scanner vuelve a guardar con más scans reemplaza su aporte anterior en vez de sumarse
+    otra vez.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.executescript(_SESSION_SCHEMA)
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def get_meta(self, key: str) -> str | None:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+        self.conn.commit()
+
+    def add_scans(self, path: Path, chunksize: int = SCANNER_CHUNKSIZE) -> tuple[str, int, int]:
+        """
+        Sumar un export. Devuelve (estado, barcodes, unidades) con estado:
+        'added' (archivo nuevo), 'replaced' (misma ruta, contenido nuevo: se reemplazó su aporte)
+        o 'seen' (esa ruta ya se sumó con este mismo contenido). Dos dispositivos con exports
+        idénticos en rutas distintas se suman los dos.
+        """
+        sha1 = hashlib.sha1(path.read_bytes()).hexdigest()
+        key = str(path.resolve())
+        stored = self.conn.execute("SELECT sha1 FROM files WHERE path = ?", (key,)).fetchone()
+        if stored and stored[0] == sha1:
+            return "seen", 0, 0
+        previous = stored is not None
+        old_rows = self.conn.execute("SELECT barcode, count FROM file_counts WHERE path = ?", (key,)).fetchall()
+        agg = _load_scanner(path, chunksize)
+        rows = [(str(b), int(c)) for b, c in zip(agg["barcode"], agg["count"])]
+        units = sum(c for _, c in rows)
+        with self.conn:  # una transacción: el archivo entra completo o no entra
+            if previous:
+                # El scanner re-guardó el archivo: restar su aporte anterior antes de sumar el nuevo
+                self.conn.executemany("UPDATE counts SET count = count - ? WHERE barcode = ?",
+                                      [(c, b) for b, c in old_rows])
+                self.conn.execute("DELETE FROM counts WHERE count <= 0")
+                self.conn.execute("DELETE FROM file_counts WHERE path = ?", (key,))
+                self.conn.execute("DELETE FROM files WHERE path = ?", (key,))
+            self.conn.executemany(
+                "INSERT INTO counts (barcode, count) VALUES (?, ?) "
+                "ON CONFLICT(barcode) DO UPDATE SET count = count + excluded.count",
+                rows,
+            )
+            self.conn.executemany(
+                "INSERT INTO file_counts (path, barcode, count) VALUES (?, ?, ?)",
+                [(key, b, c) for b, c in rows],
+            )
+            self.conn.execute(
+                "INSERT INTO files (sha1, path, barcodes, units, added_at) VALUES (?, ?, ?, ?, ?)",
+                (sha1, key, len(rows), units, datetime.now().isoformat(timespec="seconds")),
+            )
+        return ("replaced" if previous else "added"), len(rows), units
+
+    def counts(self) -> pd.DataFrame:
+        df = pd.read_sql_query("SELECT barcode, count FROM counts ORDER BY barcode", self.conn)
+        df["barcode"] = df["barcode"].astype(str)
+        return df
+
+    def files(self) -> list[tuple]:
+        return self.conn.execute("SELECT path, barcodes, units, added_at FROM files ORDER BY added_at").fetchall()
+
+    def reset(self) -> None:
+        with self.conn:
+            self.conn.execute("DELETE FROM counts")
+            self.conn.execute("DELETE FROM files")
+            self.conn.execute("DELETE FROM file_counts")
+
+
+def _session_products(products_path: Path, cache: dict) -> tuple[pd.DataFrame, dict[str, int]]:
+    """Products + índice de sufijos, reutilizados mientras el archivo no cambie."""
+    key = (str(products_path), products_path.stat().st_mtime)
+    if cache.get("key") != key:
+        products = _load_products(products_path)
+        cache.update(key=key, products=products, suffix_index=_build_suffix_index(products))
+    return cache["products"], cache["suffix_index"]
+
+
+def _session_report(session: StocktakeSession, cache: dict) -> bool:
+    products_path, outdir = session.get_meta("products"), session.get_meta("outdir")
+    if not products_path or not outdir:
+        print("⚠️ La sesión todavía no tiene --products y --outdir: no se generó el reporte.")
+        return False
+    start = time.perf_counter()
+    scans = session.counts()
+    products, suffix_index = _session_products(Path(products_path), cache)
+    matched, unmatched = _match(scans, products, suffix_index)
+    out = Path(outdir); out.mkdir(parents=True, exist_ok=True)
+    _write_outputs(matched, unmatched, out)
+    if session.get_meta("variance"):
+        onhand = session.get_meta("onhand")
+        _write_variance(matched, products, Path(session.get_meta("variance")), out, Path(onhand) if onhand else None)
+    print(f"📊 {int(scans['count'].sum())} units / {len(scans)} barcodes "
+          f"({len(session.files())} files) in {time.perf_counter() - start:.1f}s")
+    return True
+
+
+def _ingest(session: StocktakeSession, path: Path, chunksize: int = SCANNER_CHUNKSIZE) -> bool:
+    try:
+        status, barcodes, units = session.add_scans(path, chunksize)
+    except Exception as e:
+        print(f"⚠️ No se pudo leer {path.name}: {e}")
+        return False
+    if status == "added":
+        print(f"➕ {path.name}: {units} units / {barcodes} barcodes")
+    elif status == "replaced":
+        print(f"🔄 {path.name}: re-guardado, su aporte se reemplazó → {units} units / {barcodes} barcodes")
+    else:
+        print(f"↩️ {path.name}: ya estaba en la sesión, no se suma de nuevo")
+    return status in ("added", "replaced")
+
+
+SCANNER_SUFFIXES = (".xlsx", ".xls", ".csv")
+OUTPUT_NAMES = {"final_count.csv", "unmatched_barcodes.xlsx"}
+
+
+def _watch(session: StocktakeSession, folder: Path, interval: float, cache: dict,
+           chunksize: int = SCANNER_CHUNKSIZE) -> None:
+    """Revisar 'folder' cada 'interval' s; cada export nuevo se suma (uno re-guardado reemplaza su aporte) y se regenera el reporte."""
+    seen: dict[str, tuple] = {}
+    print(f"👀 Watching {folder} (Ctrl+C para terminar)")
+    try:
+        while True:
+            added = False
+            for path in sorted(folder.iterdir(), key=lambda f: f.stat().st_mtime):
+                if (path.suffix.lower() not in SCANNER_SUFFIXES or path.name in OUTPUT_NAMES
+                        or path.name.startswith(("~$", "."))):
+                    continue
+                st = path.stat()
+                signature = (st.st_size, st.st_mtime)
+                if seen.get(path.name) == signature or time.time() - st.st_mtime < 2:
+                    continue  # ya visto, o todavía se está copiando
+                seen[path.name] = signature
+                added = _ingest(session, path, chunksize) or added
+            if added:
+                _session_report(session, cache)
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("🔚 Watch stopped.")
+
+
+def _run_session(args: argparse.Namespace) -> int:
+    session = StocktakeSession(Path(args.session))
+    cache: dict = {}
+    try:
+        if args.reset:
+            session.reset()
+            print("🗑️ Session cleared")
+        if args.products:
+            session.set_meta("products", str(Path(args.products).resolve()))
+        if args.outdir:
+            session.set_meta("outdir", str(Path(args.outdir).resolve()))
+        if args.variance:
+            session.set_meta("variance", str(Path(args.variance).resolve()))
+        if args.onhand:
+            session.set_meta("onhand", str(Path(args.onhand).resolve()))
+
+        added = False
+        for f in args.add:
+            added = _ingest(session, Path(f), args.chunksize) or added
+        if args.status:
+            for path, barcodes, units, added_at in session.files():
+                print(f"{added_at}  {units:>6} units / {barcodes:>5} barcodes  {path}")
+            scans = session.counts()
+            print(f"Σ {int(scans['count'].sum())} units / {len(scans)} barcodes")
+        if args.report or added:
+            if not _session_report(session, cache) and args.report:
+                return 1
+        if args.watch:
+            _watch(session, Path(args.watch), args.interval, cache, args.chunksize)
+    finally:
+        session.close()
+    return 0
+
+
+def main() -> int:
+    args = _parse_args()
+    if args.session:
+        return _run_session(args)
+
+    scanner_paths = [Path(f) for f in (args.scanner1, args.scanner2, *args.scanners) if f]
+    pr = Path(args.products)
+    outdir = Path(args.outdir); outdir.mkdir(parents=True, exist_ok=True)
+
+    scans = pd.concat([_load_scanner(f, args.chunksize) for f in scanner_paths], ignore_index=True)
+    scans = scans.groupby("barcode", as_index=False)["count"].sum()
+
+    products = _load_products(pr)
+    matched, unmatched = _match(scans, products)
+    _write_outputs(matched, unmatched, outdir)
+    if args.variance:
+        _write_variance(matched, products, Path(args.variance), outdir, Path(args.onhand) if args.onhand else None)
     return 0
 
 if __name__ == "__main__":
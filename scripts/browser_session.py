@@ -0,0 +1,277 @@
+"""
+Warm, logged-in Lightspeed browser shared by the bots (4-upload.py, 8-upload_promos.py).
+
+Every bot run used to launch Chromium, load the profile and go through the login form.
+The session service keeps ONE persistent context open (chrome-profiles/Bot-Profile)
+and exposes it over the Chrome DevTools Protocol; the bots attach to it, open a page,
+and leave the context running when they finish.
+
+- On start the context is seeded with the still-valid cookies of lightspeed_cookies.json.
+- The service then sleeps until the earliest kounta.com session cookie expires; only then
+  it re-reads the cookie export and checks that the session still works.
+- If no service is running, attach() returns None and the bots launch their own browser as before.
+
+Usage (from the project root):
+    python scripts/browser_session.py serve [--port 9333] [--headless]
+    python scripts/browser_session.py status
+    python scripts/browser_session.py stop
+"""
+
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from kounta_api import DEFAULT_COOKIES_PATH, load_valid_cookies
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPTS_DIR, ".."))
+PROFILE_DIR = os.path.join(PROJECT_ROOT, "chrome-profiles", "Bot-Profile")
+STATE_PATH = os.path.join(PROJECT_ROOT, ".cache", "browser_session.json")
+DEFAULT_PORT = 9333
+
+# Página que solo carga con sesión iniciada (si no, redirige al login)
+SESSION_CHECK_URL = "https://purchase.kounta.com/purchase#orders"
+
+# Opciones compartidas por todos los navegadores de los bots
+CONTEXT_OPTIONS = dict(
+    viewport={'width': 1366, 'height': 768},
+    user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    locale='es-ES',
+    timezone_id='Europe/Madrid',
+    extra_http_headers={
+        'Accept-Language': 'es-ES,es;q=0.9,en;q=0.8',
+        'Accept-Encoding': 'gzip, deflate, br',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+        'DNT': '1',
+        'Connection': 'keep-alive',
+        'Upgrade-Insecure-Requests': '1',
+    },
+)
+
+BROWSER_ARGS = [
+    '--no-sandbox',
+    '--disable-blink-features=AutomationControlled',
+    '--disable-web-security',
+    '--disable-features=VizDisplayCompositor',
+    '--disable-dev-shm-usage',
+    '--no-first-run',
+    '--disable-extensions',
+    '--disable-plugins',
+    '--disable-default-apps',
+    '--disable-background-mode'
+]
+
+# Ocultar webdriver
+STEALTH_INIT_SCRIPT = """
+    Object.defineProperty(navigator, 'webdriver', {
+        get: () => undefined,
+    });
+
+    window.chrome = {
+        runtime: {},
+    };
+
+    Object.defineProperty(navigator, 'plugins', {
+        get: () => [1, 2, 3, 4, 5],
+    });
+"""
+
+_SAME_SITE = {"no_restriction": "None", "none": "None", "lax": "Lax", "strict": "Strict"}
+
+
+# =========================
+# Cookies
+# =========================
+def playwright_cookies(cookies_path: Optional[str] = None) -> List[dict]:
+    """Valid cookies of the extension export, in context.add_cookies() format."""
+    converted = []
+    for c in load_valid_cookies(cookies_path):
+        cookie = {
+            "name": c["name"],
+            "value": c["value"],
+            "domain": c["domain"],
+            "path": c.get("path") or "/",
+            "httpOnly": bool(c.get("httpOnly")),
+            "secure": bool(c.get("secure")),
+            "sameSite": _SAME_SITE.get(str(c.get("sameSite", "")).lower(), "Lax"),
+        }
+        if c.get("expirationDate") and not c.get("session"):
+            cookie["expires"] = float(c["expirationDate"])
+        converted.append(cookie)
+    return converted
+
+
+def next_expiry(context) -> Optional[float]:
+    """Earliest expiry (epoch seconds) among the context's persistent kounta.com cookies."""
+    expiries = [
+        c["expires"] for c in context.cookies()
+        if c.get("domain", "").lstrip(".").endswith("kounta.com") and c.get("expires", -1) > 0
+    ]
+    return min(expiries) if expiries else None
+
+
+def session_is_logged_in(page, url: str = SESSION_CHECK_URL) -> bool:
+    """Open a page that requires a session; a redirect to the login form means it expired."""
+    try:
+        page.goto(url, wait_until="networkidle", timeout=20000)
+    except Exception:
+        return False
+    return "login" not in page.url.lower()
+
+
+# =========================
+# State file
+# =========================
+def read_state() -> Optional[dict]:
+    try:
+        with open(STATE_PATH, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _write_state(state: dict):
+    os.makedirs(os.path.dirname(STATE_PATH), exist_ok=True)
+    with open(STATE_PATH, "w") as f:
+        json.dump(state, f, indent=2)
+
+
+def _clear_state():
+    try:
+        os.remove(STATE_PATH)
+    except FileNotFoundError:
+        pass
+
+
+# =========================
+# Client side
+# =========================
+def attach(playwright, timeout_ms: int = 5000):
+    """
+    Shared context of a running session service, or None if there isn't one.
+    Callers open their own pages and must NOT close the context.
+    """
+    state = read_state()
+    if not state:
+        return None
+    try:
+        browser = playwright.chromium.connect_over_cdp(state["cdp_url"], timeout=timeout_ms)
+    except Exception:
+        return None
+    if not browser.contexts:
+        return None
+    print(f"♻️ Using warm browser session at {state['cdp_url']}")
+    return browser.contexts[0]
+
+
+# =========================
+# Service
+# =========================
+def serve(port: int = DEFAULT_PORT, headless: bool = False, cookies_path: Optional[str] = None):
+    from playwright.sync_api import sync_playwright
+
+    cookies_path = cookies_path or DEFAULT_COOKIES_PATH
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with sync_playwright() as p:
+        context = p.chromium.launch_persistent_context(
+            user_data_dir=PROFILE_DIR,
+            headless=headless,
+            args=BROWSER_ARGS + [f"--remote-debugging-port={port}"],
+            **CONTEXT_OPTIONS,
+        )
+        try:
+            context.add_init_script(STEALTH_INIT_SCRIPT)
+            seeded = playwright_cookies(cookies_path)
+            if seeded:
+                context.add_cookies(seeded)
+            print(f"🍪 Seeded {len(seeded)} cookies from {os.path.basename(cookies_path)}")
+
+            # Página "ancla": mantiene el contexto vivo y se usa para revalidar la sesión
+            keeper = context.pages[0] if context.pages else context.new_page()
+            logged_in = session_is_logged_in(keeper)
+            print("✅ Session active" if logged_in else "⚠️ Not logged in yet: the first bot run will log in through the form")
+
+            _write_state({
+                "cdp_url": f"http://127.0.0.1:{port}",
+                "pid": os.getpid(),
+                "started_at": datetime.now().isoformat(timespec="seconds"),
+            })
+            print(f"🟢 Browser session serving on http://127.0.0.1:{port} (Ctrl+C or 'stop' to end)")
+
+            while True:
+                expiry = next_expiry(context)
+                wait_s = 60.0 if expiry is None else max(1.0, min(expiry - time.time(), 3600.0))
+                keeper.wait_for_timeout(wait_s * 1000)  # también procesa eventos de Playwright
+                expiry = next_expiry(context)
+                if expiry is not None and expiry > time.time():
+                    continue
+
+                # Una cookie de sesión venció: recargar el export y volver a comprobar
+                print(f"🔄 Session cookie expired at {datetime.now():%H:%M:%S}; re-validating…")
+                fresh = playwright_cookies(cookies_path)
+                if fresh:
+                    context.add_cookies(fresh)
+                if session_is_logged_in(keeper):
+                    print("✅ Session still valid")
+                else:
+                    print("⚠️ Session expired: export fresh cookies or let the next bot run log in")
+        except KeyboardInterrupt:
+            pass
+        except Exception as e:
+            # El navegador se cerró ('stop' o a mano)
+            print(f"ℹ️ Browser session ended: {e}")
+        finally:
+            _clear_state()
+            try:
+                context.close()
+            except Exception:
+                pass
+    print("🔚 Browser session stopped.")
+
+
+def stop() -> bool:
+    """Ask the running service's browser to close (the service then exits on its own)."""
+    from playwright.sync_api import sync_playwright
+
+    state = read_state()
+    if not state:
+        return False
+    with sync_playwright() as p:
+        try:
+            browser = p.chromium.connect_over_cdp(state["cdp_url"], timeout=5000)
+            browser.new_browser_cdp_session().send("Browser.close")
+        except Exception:
+            # Estado viejo de un servicio que ya no corre
+            _clear_state()
+            return False
+    return True
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Persistent logged-in Lightspeed browser for the bots")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_serve = sub.add_parser("serve", help="Start the shared browser and keep it warm")
+    p_serve.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Puerto CDP (default: {DEFAULT_PORT})")
+    p_serve.add_argument("--headless", action="store_true", help="Sin ventana")
+    p_serve.add_argument("--cookies", default=None, help="Export de cookies (default: lightspeed_cookies.json)")
+    sub.add_parser("status", help="Show whether a session service is running")
+    sub.add_parser("stop", help="Stop the running session service")
+    args = parser.parse_args()
+
+    if args.cmd == "serve":
+        serve(args.port, args.headless, args.cookies)
+    elif args.cmd == "status":
+        state = read_state()
+        if state:
+            print(f"🟢 Running at {state['cdp_url']} (pid {state['pid']}, since {state['started_at']})")
+        else:
+            print("⚪ No browser session running")
+    elif args.cmd == "stop":
+        print("🛑 Stop requested" if stop() else "⚪ No browser session running")
+
+
+if __name__ == "__main__":
+    main_cli()
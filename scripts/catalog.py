@@ -0,0 +1,164 @@
+"""
+Compiled product catalog (assets/products.xlsx).
+
+Reading the workbook with openpyxl costs seconds on every run, so the first load
+compiles it into a pickle snapshot under .cache/catalog/ and later loads read the
+snapshot instead.
+
+- Snapshot is reused while the workbook's mtime and size are unchanged.
+- If mtime changed but the sha256 of the content is the same, the snapshot is kept.
+- Any real change to the workbook recompiles it automatically.
+
+Usage (from any script in scripts/):
+    from catalog import load_catalog
+    cat = load_catalog()                 # assets/products.xlsx
+    sheets = cat.sheets                  # {sheet_name: DataFrame} like pd.read_excel(sheet_name=None)
+    cat.code_to_name["1200738"]          # 'EMU BITTER C1'
+"""
+
+import hashlib
+import os
+import pickle
+import re
+from typing import Dict, Optional
+
+import pandas as pd
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPTS_DIR, ".."))
+DEFAULT_PRODUCTS_XLSX = os.path.join(PROJECT_ROOT, "assets", "products.xlsx")
+CACHE_DIR = os.path.join(PROJECT_ROOT, ".cache", "catalog")
+
+# Subir cuando cambie el formato del snapshot
+CATALOG_VERSION = 1
+
+_MULTI_CODE_SPLIT = re.compile(r"[\/,;|]+")
+
+# Memo en proceso: un mismo script puede pedir el catálogo varias veces
+_memo: Dict[str, "Catalog"] = {}
+
+
+class Catalog:
+    """Sheets as read from products.xlsx plus the lookup maps every script needs."""
+
+    def __init__(self, sheets: Dict[str, pd.DataFrame]):
+        self._sheets = sheets
+        self._stamp = None
+        self.code_to_name: Dict[str, str] = {}
+        self.name_to_code: Dict[str, str] = {}
+        self.code_to_supplier: Dict[str, str] = {}
+        self.supplier_codes: Dict[str, set] = {}
+
+        for supplier, df in sheets.items():
+            codes = set()
+            if "Product Code" not in df.columns or "Product Name" not in df.columns:
+                self.supplier_codes[supplier] = codes
+                continue
+            for raw_codes, name in zip(df["Product Code"], df["Product Name"]):
+                if pd.isna(raw_codes) or pd.isna(name):
+                    continue
+                name = str(name).strip()
+                for part in _MULTI_CODE_SPLIT.split(str(raw_codes)):
+                    code = part.strip()
+                    if not code:
+                        continue
+                    codes.add(code)
+                    self.code_to_name.setdefault(code, name)
+                    self.code_to_supplier.setdefault(code, supplier)
+                    self.name_to_code.setdefault(name, code)
+            self.supplier_codes[supplier] = codes
+
+    @property
+    def sheets(self) -> Dict[str, pd.DataFrame]:
+        # Copias: los scripts renombran columnas / normalizan in-place
+        return {name: df.copy() for name, df in self._sheets.items()}
+
+    def sheet(self, name: str) -> pd.DataFrame:
+        return self._sheets[name].copy()
+
+
+def _file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _snapshot_path(products_path: str) -> str:
+    key = hashlib.sha1(products_path.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(CACHE_DIR, f"products-{key}.pkl")
+
+
+def _read_snapshot(snapshot_path: str) -> Optional[dict]:
+    try:
+        with open(snapshot_path, "rb") as f:
+            data = pickle.load(f)
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        return None
+    if data.get("version") != CATALOG_VERSION or data.get("pandas") != pd.__version__:
+        return None
+    return data
+
+
+def _write_snapshot(snapshot_path: str, data: dict) -> None:
+    try:
+        os.makedirs(os.path.dirname(snapshot_path), exist_ok=True)
+        tmp = snapshot_path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, snapshot_path)
+    except OSError as e:
+        # Sin caché seguimos funcionando; solo perdemos velocidad
+        print(f"⚠️ Could not write catalog snapshot: {e}")
+
+
+def load_catalog(products_path: Optional[str] = None, refresh: bool = False) -> Catalog:
+    """Load the compiled catalog, recompiling the snapshot only when the workbook changed."""
+    products_path = os.path.abspath(products_path or DEFAULT_PRODUCTS_XLSX)
+    if not os.path.exists(products_path):
+        raise FileNotFoundError(f"Missing products file: {products_path}")
+
+    st = os.stat(products_path)
+    memo = _memo.get(products_path)
+    if memo is not None and not refresh and memo._stamp == (st.st_mtime_ns, st.st_size):
+        return memo
+
+    snapshot_path = _snapshot_path(products_path)
+    data = None if refresh else _read_snapshot(snapshot_path)
+
+    if data is not None and (data["mtime_ns"], data["size"]) != (st.st_mtime_ns, st.st_size):
+        # Se tocó el archivo: solo recompilar si el contenido realmente cambió
+        sha = _file_sha256(products_path) if data["size"] == st.st_size else None
+        if sha == data["sha256"]:
+            data["mtime_ns"] = st.st_mtime_ns
+            _write_snapshot(snapshot_path, data)
+        else:
+            data = None
+
+    if data is None:
+        sheets = pd.read_excel(products_path, sheet_name=None)
+        data = {
+            "version": CATALOG_VERSION,
+            "pandas": pd.__version__,
+            "mtime_ns": st.st_mtime_ns,
+            "size": st.st_size,
+            "sha256": _file_sha256(products_path),
+            "catalog": Catalog(sheets),
+        }
+        _write_snapshot(snapshot_path, data)
+
+    catalog = data["catalog"]
+    catalog._stamp = (st.st_mtime_ns, st.st_size)
+    _memo[products_path] = catalog
+    return catalog
+
+
+def invalidate(products_path: Optional[str] = None) -> None:
+    """Drop the snapshot for a workbook (call after writing to products.xlsx)."""
+    products_path = os.path.abspath(products_path or DEFAULT_PRODUCTS_XLSX)
+    _memo.pop(products_path, None)
+    try:
+        os.remove(_snapshot_path(products_path))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,198 @@
+"""
+Batch purchase-order and price-list clients for Kounta / Lightspeed
+(used by 4-upload.py --backend api and 8-upload_promos.py --mode batch / diff).
+
+Instead of searching, clicking and keypad-typing every invoice line in the browser,
+all lines of a PO are sent in ONE HTTP call, authenticated with the session cookies
+exported to lightspeed_cookies.json (same file the old Selenium scripts used).
+
+Endpoints (relative to KOUNTA_PURCHASE_API, default https://purchase.kounta.com):
+    GET  /api/purchase-orders?number=<po>        -> {"orders": [{"id", "number", "total_inc", ...}]}
+    POST /api/purchase-orders                    -> {"id", "number", ...}        body: {"supplier": "ALM"}
+    POST /api/purchase-orders/<id>/lines:batch   -> {"accepted": [...], "rejected": [{"index", "reason"}]}
+                                                    body: {"lines": [{"product_id", "product_code", "product_name", "quantity", "total_cost"}],
+                                                           "replace": bool}
+    GET  /api/products?page=<n>&limit=<k>        -> {"products": [{"id", "name", ...}]}   (product_index.py)
+
+Price lists (relative to KOUNTA_BACKOFFICE_API, default https://my.kounta.com):
+    GET  /api/price-lists?name=<name>            -> {"price_lists": [{"id", "name"}]}
+    POST /api/price-lists                        -> {"id", "name"}               body: {"name": "Test"}
+    POST /api/price-lists/<id>/items:batch       -> {"accepted": [...], "rejected": [{"index", "reason"}]}
+                                                    body: {"items": [{"product_id", "product_name", "price"}]}
+    GET  /api/price-lists/<id>/items             -> {"items": [{"product_id", "product_name", "price"}]}
+    POST /api/price-lists/<id>/items:remove      -> {"removed": [...]}         body: {"items": [{"product_id", "product_name"}]}
+
+These routes and payloads are UNVERIFIED placeholders: they were not captured from the
+Lightspeed web apps and the only server known to implement them is
+scripts/kounta_stub_server.py. Check every one against real browser traffic (DevTools →
+Network) and fix ENDPOINTS and the payloads before using --backend api or the promos
+batch/diff modes against production. They are kept in one place (ENDPOINTS) so they can
+be adjusted without touching 4-upload.py. For offline testing run the stub and point
+KOUNTA_PURCHASE_API (or --api-url) at it.
+"""
+
+import json
+import os
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from typing import Dict, List, Optional
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPTS_DIR, ".."))
+DEFAULT_COOKIES_PATH = os.path.join(PROJECT_ROOT, "lightspeed_cookies.json")
+DEFAULT_BASE_URL = "https://purchase.kounta.com"
+DEFAULT_BACKOFFICE_URL = "https://my.kounta.com"
+
+# Placeholder routes (see the module docstring): only the stub server answers them as-is
+ENDPOINTS = {
+    "find_order": "/api/purchase-orders",
+    "create_order": "/api/purchase-orders",
+    "add_lines": "/api/purchase-orders/{order_id}/lines:batch",
+    "products": "/api/products",
+    "find_price_list": "/api/price-lists",
+    "create_price_list": "/api/price-lists",
+    "set_price_list_items": "/api/price-lists/{list_id}/items:batch",
+    "price_list_items": "/api/price-lists/{list_id}/items",
+    "remove_price_list_items": "/api/price-lists/{list_id}/items:remove",
+}
+
+
+class KountaAPIError(Exception):
+    """HTTP / auth / payload error talking to the purchase API."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+def load_valid_cookies(cookies_path: Optional[str] = None, domain_suffix: str = "kounta.com") -> List[dict]:
+    """
+    Cookies from a browser-extension export (list of {name, value, domain, expirationDate, ...})
+    that belong to kounta.com and haven't expired. Missing file → [].
+    """
+    cookies_path = cookies_path or DEFAULT_COOKIES_PATH
+    if not os.path.exists(cookies_path):
+        return []
+    with open(cookies_path, "r") as f:
+        cookies = json.load(f)
+
+    now = time.time()
+    valid = []
+    for c in cookies:
+        if not str(c.get("domain", "")).lstrip(".").endswith(domain_suffix):
+            continue
+        expires = c.get("expirationDate")
+        if expires is not None and not c.get("session") and float(expires) < now:
+            continue
+        valid.append(c)
+    return valid
+
+
+def load_cookie_header(cookies_path: Optional[str] = None) -> str:
+    """Cookie header with every valid kounta.com cookie of the export."""
+    cookies = load_valid_cookies(cookies_path)
+    if not cookies:
+        raise KountaAPIError(f"No valid session cookies in {cookies_path or DEFAULT_COOKIES_PATH} (expired? export them again)")
+    return "; ".join(f"{c['name']}={c['value']}" for c in cookies)
+
+
+class KountaClient:
+    """JSON over HTTP with the exported session cookies (base of the purchase and price-list clients)."""
+
+    base_url_env = "KOUNTA_PURCHASE_API"
+    default_base_url = DEFAULT_BASE_URL
+
+    def __init__(self, base_url: Optional[str] = None, cookies_path: Optional[str] = None, timeout: float = 30):
+        self.base_url = (base_url or os.getenv(self.base_url_env) or self.default_base_url).rstrip("/")
+        self.cookie_header = load_cookie_header(cookies_path)
+        self.timeout = timeout
+
+    def _request(self, method: str, path: str, payload=None, query: Optional[Dict[str, str]] = None):
+        url = self.base_url + path
+        if query:
+            url += "?" + urllib.parse.urlencode(query)
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        req = urllib.request.Request(url, data=data, method=method, headers={
+            "Cookie": self.cookie_header,
+            "Accept": "application/json",
+            "Content-Type": "application/json",
+            "X-Requested-With": "XMLHttpRequest",
+        })
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                body = resp.read().decode("utf-8") or "{}"
+        except urllib.error.HTTPError as e:
+            raise KountaAPIError(f"{method} {path} → HTTP {e.code}", status=e.code) from e
+        except urllib.error.URLError as e:
+            raise KountaAPIError(f"{method} {path} → {e.reason}") from e
+        except OSError as e:  # timeouts / conexión cortada a mitad de respuesta
+            raise KountaAPIError(f"{method} {path} → {e}") from e
+        try:
+            return json.loads(body)
+        except ValueError as e:
+            # Una página HTML en vez de JSON suele significar sesión vencida (redirect al login)
+            raise KountaAPIError(f"{method} {path} → non-JSON response (session expired?)") from e
+
+
+class KountaPurchaseAPI(KountaClient):
+    def find_order(self, po_number: str) -> Optional[dict]:
+        data = self._request("GET", ENDPOINTS["find_order"], query={"number": po_number})
+        for order in data.get("orders", []):
+            if str(order.get("number")) == str(po_number):
+                return order
+        return None
+
+    def create_order(self, supplier_name: str) -> dict:
+        return self._request("POST", ENDPOINTS["create_order"], payload={"supplier": supplier_name})
+
+    def list_products(self, params: Dict[str, int]) -> dict:
+        """One page of the searchable product list (see product_index.fetch_products)."""
+        return self._request("GET", ENDPOINTS["products"], query={k: str(v) for k, v in params.items()})
+
+    def add_lines(self, order_id, lines: List[dict], replace: bool = False) -> dict:
+        """
+        Send every line of the PO in one call. replace=True drops the lines already on the order first.
+        Returns {"accepted": [...], "rejected": [{"index", "reason"}, ...]}.
+        """
+        path = ENDPOINTS["add_lines"].format(order_id=urllib.parse.quote(str(order_id)))
+        data = self._request("POST", path, payload={"lines": lines, "replace": replace})
+        data.setdefault("accepted", [])
+        data.setdefault("rejected", [])
+        return data
+
+
+class KountaPriceListAPI(KountaClient):
+    base_url_env = "KOUNTA_BACKOFFICE_API"
+    default_base_url = DEFAULT_BACKOFFICE_URL
+
+    def find_price_list(self, name: str) -> Optional[dict]:
+        data = self._request("GET", ENDPOINTS["find_price_list"], query={"name": name})
+        for price_list in data.get("price_lists", []):
+            if str(price_list.get("name")) == name:
+                return price_list
+        return None
+
+    def create_price_list(self, name: str) -> dict:
+        return self._request("POST", ENDPOINTS["create_price_list"], payload={"name": name})
+
+    def set_items(self, list_id, items: List[dict]) -> dict:
+        """
+        Set every price in one call (items: {"product_id", "product_name", "price"}).
+        Returns {"accepted": [...], "rejected": [{"index", "reason"}, ...]}.
+        """
+        path = ENDPOINTS["set_price_list_items"].format(list_id=urllib.parse.quote(str(list_id)))
+        data = self._request("POST", path, payload={"items": items})
+        data.setdefault("accepted", [])
+        data.setdefault("rejected", [])
+        return data
+
+    def get_items(self, list_id) -> List[dict]:
+        path = ENDPOINTS["price_list_items"].format(list_id=urllib.parse.quote(str(list_id)))
+        return self._request("GET", path).get("items", [])
+
+    def remove_items(self, list_id, items: List[dict]) -> dict:
+        """Drop products from the list in one call (items: {"product_id", "product_name"})."""
+        path = ENDPOINTS["remove_price_list_items"].format(list_id=urllib.parse.quote(str(list_id)))
+        return self._request("POST", path, payload={"items": items})
@@ -0,0 +1,252 @@
+"""
+Local stand-in for the Kounta purchase and price-list APIs (see kounta_api.ENDPOINTS), for
+testing 4-upload.py --backend api and 8-upload_promos.py --mode batch/diff without touching
+the real account.
+
+Orders live in memory; requests without a Cookie header get 401 like an expired session.
+The product list (/api/products) is every name in assets/products.xlsx.
+GET /_stub/orders and /_stub/price-lists dump everything that was received.
+
+Usage (from the project root):
+    python scripts/kounta_stub_server.py --port 8765 --seed-po 123456:250.00 --reject "EMU BITTER C1"
+    python scripts/4-upload.py alm --backend api --api-url http://127.0.0.1:8765
+    python scripts/8-upload_promos.py --mode batch --api-url http://127.0.0.1:8765
+    python scripts/8-upload_promos.py --mode diff --api-url http://127.0.0.1:8765
+"""
+
+import argparse
+import itertools
+import json
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubState:
+    def __init__(self, rejected_names=(), products=()):
+        self.lock = threading.Lock()
+        self.products = [{"id": str(1000 + i), "name": name} for i, name in enumerate(products)]
+        self.orders = {}                      # id -> {"id", "number", "supplier", "lines", "total_inc"}
+        self.price_lists = {}                 # id -> {"id", "name", "items": {product_name: item}}
+        self.rejected_names = set(rejected_names)
+        self._ids = itertools.count(1)
+        self._numbers = itertools.count(900001)
+
+    def seed(self, number: str, total_inc: float = 0.0):
+        """Existing PO with one pre-loaded line (what the UI flow removes before adding products)."""
+        with self.lock:
+            order_id = str(next(self._ids))
+            self.orders[order_id] = {
+                "id": order_id, "number": str(number), "supplier": None, "total_inc": float(total_inc),
+                "lines": [{"product_code": None, "product_name": "(pre-loaded)", "quantity": 1, "total_cost": float(total_inc)}],
+            }
+
+    def create(self, supplier):
+        with self.lock:
+            order_id = str(next(self._ids))
+            order = {"id": order_id, "number": str(next(self._numbers)), "supplier": supplier, "lines": [], "total_inc": 0.0}
+            self.orders[order_id] = order
+            return order
+
+    def add_lines(self, order_id, lines, replace):
+        with self.lock:
+            order = self.orders.get(order_id)
+            if order is None:
+                return None
+            accepted, rejected = [], []
+            for i, line in enumerate(lines):
+                name = line.get("product_name")
+                if not name or name in self.rejected_names:
+                    rejected.append({"index": i, "reason": "unknown product"})
+                elif int(line.get("quantity") or 0) <= 0:
+                    rejected.append({"index": i, "reason": "invalid quantity"})
+                else:
+                    accepted.append(line)
+            if replace:
+                order["lines"] = []
+            order["lines"].extend(accepted)
+            order["total_inc"] = round(sum(float(l.get("total_cost") or 0) for l in order["lines"]), 2)
+            return {"accepted": [l["product_name"] for l in accepted], "rejected": rejected}
+
+
+    def create_price_list(self, name):
+        with self.lock:
+            list_id = str(next(self._ids))
+            self.price_lists[list_id] = {"id": list_id, "name": name, "items": {}}
+            return {"id": list_id, "name": name}
+
+    def set_price_items(self, list_id, items):
+        with self.lock:
+            price_list = self.price_lists.get(list_id)
+            if price_list is None:
+                return None
+            accepted, rejected = [], []
+            for i, item in enumerate(items):
+                name = item.get("product_name")
+                try:
+                    price = float(str(item.get("price")).replace("$", ""))
+                except ValueError:
+                    price = -1
+                if not name or name in self.rejected_names:
+                    rejected.append({"index": i, "reason": "unknown product"})
+                elif price < 0:
+                    rejected.append({"index": i, "reason": "invalid price"})
+                else:
+                    price_list["items"][name] = {"product_id": item.get("product_id"), "product_name": name, "price": price}
+                    accepted.append(name)
+            return {"accepted": accepted, "rejected": rejected}
+
+    def remove_price_items(self, list_id, items):
+        with self.lock:
+            price_list = self.price_lists.get(list_id)
+            if price_list is None:
+                return None
+            removed = [i.get("product_name") for i in items if price_list["items"].pop(i.get("product_name"), None)]
+            return {"removed": removed}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    state: StubState = None
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authorized(self):
+        if not self.headers.get("Cookie"):
+            self._send(401, {"error": "not logged in"})
+            return False
+        return True
+
+    def _json_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        if url.path == "/_stub/orders":
+            with self.state.lock:
+                return self._send(200, {"orders": list(self.state.orders.values())})
+        if url.path == "/_stub/price-lists":
+            with self.state.lock:
+                return self._send(200, {"price_lists": list(self.state.price_lists.values())})
+        if not self._authorized():
+            return
+        if url.path == "/api/purchase-orders":
+            number = urllib.parse.parse_qs(url.query).get("number", [None])[0]
+            with self.state.lock:
+                orders = [
+                    {k: o[k] for k in ("id", "number", "supplier", "total_inc")}
+                    for o in self.state.orders.values()
+                    if number is None or o["number"] == number
+                ]
+            return self._send(200, {"orders": orders})
+        if url.path == "/api/products":
+            query = urllib.parse.parse_qs(url.query)
+            page = int(query.get("page", ["1"])[0])
+            limit = int(query.get("limit", ["500"])[0])
+            return self._send(200, {"products": self.state.products[(page - 1) * limit: page * limit]})
+        if url.path == "/api/price-lists":
+            name = urllib.parse.parse_qs(url.query).get("name", [None])[0]
+            with self.state.lock:
+                lists = [
+                    {"id": pl["id"], "name": pl["name"]}
+                    for pl in self.state.price_lists.values()
+                    if name is None or pl["name"] == name
+                ]
+            return self._send(200, {"price_lists": lists})
+        parts = url.path.strip("/").split("/")
+        if len(parts) == 4 and parts[:2] == ["api", "price-lists"] and parts[3] == "items":
+            with self.state.lock:
+                price_list = self.state.price_lists.get(parts[2])
+                if price_list is None:
+                    return self._send(404, {"error": "price list not found"})
+                return self._send(200, {"items": list(price_list["items"].values())})
+        self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        path = urllib.parse.urlparse(self.path).path
+        try:
+            payload = self._json_body()
+        except ValueError:
+            return self._send(400, {"error": "invalid JSON"})
+
+        if path == "/api/purchase-orders":
+            order = self.state.create(payload.get("supplier"))
+            return self._send(201, {k: order[k] for k in ("id", "number", "supplier", "total_inc")})
+
+        if path == "/api/price-lists":
+            return self._send(201, self.state.create_price_list(payload.get("name")))
+
+        parts = path.strip("/").split("/")
+        if len(parts) == 4 and parts[:2] == ["api", "price-lists"] and parts[3] == "items:batch":
+            result = self.state.set_price_items(parts[2], payload.get("items") or [])
+            if result is None:
+                return self._send(404, {"error": "price list not found"})
+            return self._send(200, result)
+        if len(parts) == 4 and parts[:2] == ["api", "price-lists"] and parts[3] == "items:remove":
+            result = self.state.remove_price_items(parts[2], payload.get("items") or [])
+            if result is None:
+                return self._send(404, {"error": "price list not found"})
+            return self._send(200, result)
+        if len(parts) == 4 and parts[:2] == ["api", "purchase-orders"] and parts[3] == "lines:batch":
+            result = self.state.add_lines(parts[2], payload.get("lines") or [], bool(payload.get("replace")))
+            if result is None:
+                return self._send(404, {"error": "order not found"})
+            return self._send(200, result)
+        self._send(404, {"error": "not found"})
+
+    def log_message(self, fmt, *args):
+        print(f"[stub] {self.address_string()} {fmt % args}")
+
+
+def make_server(host="127.0.0.1", port=0, state=None):
+    """Build (not start) a stub server; port=0 picks a free port (server.server_address[1])."""
+    handler = type("BoundStubHandler", (StubHandler,), {"state": state or StubState()})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def _catalog_names():
+    """Every product name of products.xlsx (the stub's product list)."""
+    try:
+        from catalog import load_catalog
+        names = set(load_catalog().name_to_code) | {"Administration Fee"}
+    except Exception as e:
+        print(f"⚠️ No product list for the stub: {e}")
+        return []
+    return sorted(names)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Offline stand-in for the Kounta purchase API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed-po", action="append", default=[], metavar="NUMBER[:TOTAL]",
+                        help="PO existente (sin ceros a la izquierda), opcionalmente con su Total(inc.)")
+    parser.add_argument("--reject", action="append", default=[], metavar="PRODUCT_NAME",
+                        help="Nombre de producto que el stub rechaza (para probar el reporte de líneas rechazadas)")
+    args = parser.parse_args()
+
+    state = StubState(rejected_names=args.reject, products=_catalog_names())
+    for spec in args.seed_po:
+        number, _, total = spec.partition(":")
+        state.seed(number, float(total or 0))
+
+    server = make_server(args.host, args.port, state)
+    print(f"🧪 Kounta stub listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,211 @@
+"""
+Persistent report-name -> (supplier, product code) mappings (assets/name_mappings.sqlite).
+
+5-report.py checks the CONFIRMED entries ("manual") before any fuzzy scoring, so names
+confirmed once resolve with a single lookup. Matches accepted by the fuzzy matcher are
+only recorded as suggestions ("auto"): they are rescored every run until someone
+confirms them, so a wrong fuzzy match never becomes permanent. Manual entries are never
+overwritten by auto ones.
+
+Names are keyed after map_suffix (the same normalization 5-report.py applies), so the
+CLI accepts the name exactly as it appears in the report: "VB C24" is stored as "VB C1".
+
+Usage (from the project root):
+    python scripts/name_mappings.py list [--suggestions]
+    python scripts/name_mappings.py confirm "GREAT NORTHERN 3.5 C30"          # accept the auto suggestion
+    python scripts/name_mappings.py add "GREAT NORTHERN 3.5 C30" CUB 95725
+    python scripts/name_mappings.py remove "GREAT NORTHERN 3.5 C30"
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPTS_DIR, ".."))
+DEFAULT_DB_PATH = os.path.join(PROJECT_ROOT, "assets", "name_mappings.sqlite")
+
+EXCEPTIONS_C30_TO_C1 = {
+    "EMU EXPORT", "EMU BITTER", "IRON JACK MID", "CARLTON DRY", "CARLTON DRY 3.5", "CARLTON MID",
+    "GREAT NORTHERN ORIGINAL", "GREAT NORTHERN 3.5", "VB", "HAHN 3.5", "HAHN SUPER DRY", "XXXX GOLD"
+}
+
+
+def map_suffix(product_name):
+    """Report name -> mapping key: upper-cased, with the pack suffix rewritten (VB C24 -> VB C1)."""
+    name = product_name.strip().upper()
+
+    # Excepción específica para "CORONA S24 (12PK)"
+    if name == "CORONA S24 (12PK)":
+        return "CORONA S12"
+
+    if name.endswith("C30 PK"):
+        base_name = name[:-7].strip()
+        return f"{base_name} C10"
+
+    base_name = re.sub(r'\s+[CS]\d{1,2}$', '', name, flags=re.IGNORECASE)
+    suffix_match = re.search(r'(C|S)(\d{2})$', name)
+
+    if suffix_match:
+        kind = suffix_match.group(1)
+        size = int(suffix_match.group(2))
+
+        if size == 30 and base_name in EXCEPTIONS_C30_TO_C1:
+            return f"{base_name} {kind}1"
+        elif size in {24, 16}:
+            return f"{base_name} {kind}1"
+        elif size in {20, 30}:
+            return f"{base_name} {kind}10"
+
+    return name
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS name_mappings (
+    report_name  TEXT PRIMARY KEY,
+    supplier     TEXT NOT NULL,
+    product_code TEXT NOT NULL,
+    source       TEXT NOT NULL DEFAULT 'auto',
+    score        REAL,
+    updated_at   TEXT NOT NULL
+)
+"""
+
+
+class MappingStore:
+    """Small SQLite table keyed by the normalized report name (map_suffix output)."""
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or DEFAULT_DB_PATH
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute(_SCHEMA)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def lookup_many(self, names: Iterable[str], sources: Tuple[str, ...] = ("manual",)) -> Dict[str, Tuple[str, str]]:
+        """Return {report_name: (supplier, product_code)} for the names known with one of 'sources' (default: confirmed only)."""
+        names = list(names)
+        found = {}
+        source_marks = ",".join("?" * len(sources))
+        # SQLite limita la cantidad de parámetros por consulta
+        for i in range(0, len(names), 500):
+            chunk = names[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT report_name, supplier, product_code FROM name_mappings "
+                f"WHERE report_name IN ({placeholders}) AND source IN ({source_marks})",
+                chunk + list(sources),
+            )
+            for name, supplier, code in rows:
+                found[name] = (supplier, code)
+        return found
+
+    def remember_many(self, matches: Iterable[Tuple[str, str, str, float]]):
+        """Record auto matches (name, supplier, code, score) as suggestions; manual entries are kept as they are."""
+        now = datetime.now().isoformat(timespec="seconds")
+        self.conn.executemany(
+            """
+            INSERT INTO name_mappings (report_name, supplier, product_code, source, score, updated_at)
+            VALUES (?, ?, ?, 'auto', ?, ?)
+            ON CONFLICT(report_name) DO UPDATE SET
+                supplier = excluded.supplier,
+                product_code = excluded.product_code,
+                score = excluded.score,
+                updated_at = excluded.updated_at
+            WHERE name_mappings.source = 'auto'
+            """,
+            [(name, supplier, str(code), float(score), now) for name, supplier, code, score in matches],
+        )
+        self.conn.commit()
+
+    def confirm(self, name: str, supplier: str, code: str):
+        """Record a manual mapping (overrides anything stored for that name)."""
+        now = datetime.now().isoformat(timespec="seconds")
+        self.conn.execute(
+            """
+            INSERT OR REPLACE INTO name_mappings (report_name, supplier, product_code, source, score, updated_at)
+            VALUES (?, ?, ?, 'manual', NULL, ?)
+            """,
+            (name, supplier, str(code), now),
+        )
+        self.conn.commit()
+
+    def confirm_suggestion(self, name: str) -> Optional[Tuple[str, str]]:
+        """Promote the stored auto suggestion for 'name' to manual; returns (supplier, code) or None."""
+        cur = self.conn.execute(
+            "UPDATE name_mappings SET source = 'manual', updated_at = ? WHERE report_name = ? AND source = 'auto'",
+            (datetime.now().isoformat(timespec="seconds"), name),
+        )
+        self.conn.commit()
+        if not cur.rowcount:
+            return None
+        return self.conn.execute(
+            "SELECT supplier, product_code FROM name_mappings WHERE report_name = ?", (name,)
+        ).fetchone()
+
+    def forget(self, name: str) -> bool:
+        cur = self.conn.execute("DELETE FROM name_mappings WHERE report_name = ?", (name,))
+        self.conn.commit()
+        return cur.rowcount > 0
+
+    def all(self):
+        return self.conn.execute(
+            "SELECT report_name, supplier, product_code, source, score, updated_at FROM name_mappings ORDER BY report_name"
+        ).fetchall()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Manage learned report-name → product code mappings")
+    parser.add_argument("--db", default=None, help="Ruta a la base SQLite (default: assets/name_mappings.sqlite)")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_list = sub.add_parser("list", help="Mostrar todas las asociaciones")
+    p_list.add_argument("--suggestions", action="store_true", help="Solo las sugerencias automáticas sin confirmar")
+    p_confirm = sub.add_parser("confirm", help="Aceptar la sugerencia automática de un nombre")
+    p_confirm.add_argument("name", help="Nombre tal como aparece en el reporte")
+    p_add = sub.add_parser("add", help="Confirmar una asociación manualmente")
+    p_add.add_argument("name", help="Nombre tal como aparece en el reporte (se normaliza con map_suffix)")
+    p_add.add_argument("supplier", help="Hoja de products.xlsx (ALM, COKE, CUB, LION)")
+    p_add.add_argument("code", help="Product Code")
+    p_rm = sub.add_parser("remove", help="Borrar una asociación")
+    p_rm.add_argument("name", help="Nombre tal como aparece en el reporte")
+    args = parser.parse_args()
+
+    with MappingStore(args.db) as store:
+        if args.cmd == "list":
+            for name, supplier, code, source, score, updated in store.all():
+                if args.suggestions and source != "auto":
+                    continue
+                score_txt = f"{score:.0f}" if score is not None else "-"
+                print(f"{name} → {supplier} {code}  [{source}, score {score_txt}, {updated}]")
+        elif args.cmd == "confirm":
+            name = map_suffix(args.name)
+            hit = store.confirm_suggestion(name)
+            if hit:
+                print(f"✅ {name} → {hit[0]} {hit[1]}")
+            else:
+                print(f"⚠️ No suggestion to confirm for {name}")
+        elif args.cmd == "add":
+            name = map_suffix(args.name)
+            store.confirm(name, args.supplier.strip().upper(), args.code.strip())
+            print(f"✅ {name} → {args.supplier.strip().upper()} {args.code.strip()}")
+        elif args.cmd == "remove":
+            name = map_suffix(args.name)
+            if store.forget(name):
+                print(f"🗑️ Removed {name}")
+            else:
+                print(f"⚠️ No mapping for {name}")
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,126 @@
+"""
+Pacing profiles for the Lightspeed (Kounta) bots: 4-upload.py and 8-upload_promos.py.
+
+The bots used to sleep a random, human-like amount after almost every action.
+A Pacer centralizes those pauses:
+
+- "stealth": same timings as before (full random sleeps, per-character typing)
+- "normal":  sleeps scaled down, waits for network idle after page-changing actions, fill() instead of typing
+- "fast":    no sleeps at all; only event-driven waits (selectors / network idle)
+
+The profile is picked with --pacing on the command line or LIGHTSPEED_PACING in .env
+(default: "normal"). Every pacer keeps track of how much wall time went to fixed sleeps
+versus event-driven waits, printed at the end of each run via summary().
+"""
+
+import os
+import random
+import time
+from typing import Optional
+
+DEFAULT_PROFILE = "normal"
+
+
+class PacingProfile:
+    def __init__(self, name: str, sleep_scale: float, human_typing: bool, settle_on_idle: bool, idle_timeout_ms: int = 3000):
+        self.name = name
+        self.sleep_scale = sleep_scale          # multiplier applied to every random delay
+        self.human_typing = human_typing        # per-character typing vs fill()
+        self.settle_on_idle = settle_on_idle    # wait for network idle where the caller passes a page
+        self.idle_timeout_ms = idle_timeout_ms
+
+
+PROFILES = {
+    "stealth": PacingProfile("stealth", sleep_scale=1.0, human_typing=True, settle_on_idle=False),
+    "normal": PacingProfile("normal", sleep_scale=0.3, human_typing=False, settle_on_idle=True),
+    "fast": PacingProfile("fast", sleep_scale=0.0, human_typing=False, settle_on_idle=True),
+}
+
+
+def resolve_profile_name(cli_value: Optional[str] = None) -> str:
+    name = (cli_value or os.getenv("LIGHTSPEED_PACING") or DEFAULT_PROFILE).strip().lower()
+    if name not in PROFILES:
+        raise ValueError(f"Unknown pacing profile '{name}'. Use one of: {', '.join(PROFILES)}")
+    return name
+
+
+class Pacer:
+    def __init__(self, profile: str = DEFAULT_PROFILE):
+        self.profile = PROFILES[resolve_profile_name(profile)]
+        self.slept = 0.0
+        self.sleeps = 0
+        self.waited = 0.0
+        self.waits = 0
+
+    # --- fixed pauses -------------------------------------------------------
+    def _sleep(self, seconds: float):
+        if seconds <= 0:
+            return
+        time.sleep(seconds)
+        self.slept += seconds
+        self.sleeps += 1
+
+    def delay(self, min_seconds: float = 1, max_seconds: float = 3, page=None):
+        """
+        Random pause scaled by the profile. If 'page' is given and the profile is event-driven,
+        wait for the network to go idle first (that's usually what the pause was standing in for).
+        """
+        if page is not None and self.profile.settle_on_idle:
+            self.settle(page)
+        self._sleep(random.uniform(min_seconds, max_seconds) * self.profile.sleep_scale)
+
+    def keystroke_delay(self, min_ms: float, max_ms: float) -> float:
+        """Per-key delay (ms) for Playwright .type()/keyboard.type(); 0 when not typing like a human."""
+        if not self.profile.human_typing:
+            return 0
+        return random.uniform(min_ms, max_ms)
+
+    # --- event-driven waits -------------------------------------------------
+    def settle(self, page, timeout_ms: Optional[int] = None):
+        """Wait for network idle, bounded; a timeout is not an error."""
+        start = time.perf_counter()
+        try:
+            page.wait_for_load_state("networkidle", timeout=timeout_ms or self.profile.idle_timeout_ms)
+        except Exception:
+            pass
+        finally:
+            self.waited += time.perf_counter() - start
+            self.waits += 1
+
+    def wait(self, locator, state: str = "visible", timeout: int = 8000):
+        """locator.wait_for() with the elapsed time recorded as waiting."""
+        start = time.perf_counter()
+        try:
+            locator.wait_for(state=state, timeout=timeout)
+        finally:
+            self.waited += time.perf_counter() - start
+            self.waits += 1
+        return locator
+
+    # --- typing -------------------------------------------------------------
+    def type_into(self, locator, text: str, min_ms: float = 20, max_ms: float = 60):
+        """Type like a human (stealth) or fill the whole value at once."""
+        if self.profile.human_typing:
+            delay_ms = random.uniform(min_ms, max_ms)
+            start = time.perf_counter()
+            locator.type(text, delay=delay_ms)
+            self.slept += time.perf_counter() - start
+            self.sleeps += 1
+        else:
+            locator.fill(text)
+
+    def type_chars(self, locator, text: str):
+        """Character-by-character typing with 50-150 ms gaps (stealth); fill() otherwise."""
+        if not self.profile.human_typing:
+            locator.fill(text)
+            return
+        for char in text:
+            locator.type(char)
+            self._sleep(random.uniform(0.05, 0.15))
+
+    # --- report -------------------------------------------------------------
+    def summary(self) -> str:
+        return (
+            f"⏱️ Pacing '{self.profile.name}': slept {self.slept:.1f}s in {self.sleeps} pauses, "
+            f"waited {self.waited:.1f}s in {self.waits} event waits"
+        )
@@ -0,0 +1,192 @@
+"""
+Local index of the Lightspeed product list (name → internal id), shared by
+4-upload.py and 8-upload_promos.py (.cache/product_index/<host>.json).
+
+Both bots used to type every product name into the search box, press Enter and wait
+for the results before looking for the exact-text match. With the index, fetched once
+per session (default: reused for 12 hours):
+
+- names Lightspeed doesn't know are reported before the PO / price list is touched;
+- known names are added with one targeted filter (type the exact name, wait for the
+  exact option; no Enter + network round-trip per line);
+- the API backend sends the internal product id instead of the name.
+
+If the product list can't be fetched, the bots keep working exactly as before.
+
+Usage (from the project root):
+    python scripts/product_index.py refresh      # fetch with lightspeed_cookies.json
+    python scripts/product_index.py show "EMU BITTER C1"
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+import urllib.parse
+from typing import Callable, Dict, Iterable, List, Optional
+
+from kounta_api import DEFAULT_BASE_URL, ENDPOINTS, KountaAPIError, KountaPurchaseAPI
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPTS_DIR, ".."))
+INDEX_DIR = os.path.join(PROJECT_ROOT, ".cache", "product_index")
+MAX_AGE_SECONDS = 12 * 3600
+PAGE_SIZE = 500
+
+
+def _fold(name: str) -> str:
+    return re.sub(r"\s+", " ", str(name)).strip().casefold()
+
+
+class ProductIndex:
+    """Exact and case/whitespace-insensitive lookup over the fetched product list."""
+
+    def __init__(self, products: List[dict], fetched_at: float = 0.0):
+        self.products = products
+        self.fetched_at = fetched_at
+        self._exact: Dict[str, dict] = {}
+        self._folded: Dict[str, dict] = {}
+        for p in products:
+            self._exact.setdefault(p["name"], p)
+            self._folded.setdefault(_fold(p["name"]), p)
+
+    def __len__(self):
+        return len(self.products)
+
+    def get(self, name: str, exact: bool = False) -> Optional[dict]:
+        """exact=True: only the literal name (what the UI's exact-text match needs)."""
+        if exact:
+            return self._exact.get(name)
+        return self._exact.get(name) or self._folded.get(_fold(name))
+
+    def missing(self, names: Iterable[str]) -> List[str]:
+        """Names not in the index (empty index → nothing is reported missing)."""
+        if not self.products:
+            return []
+        return [n for n in names if self.get(n) is None]
+
+
+def _parse_products(payload) -> List[dict]:
+    items = payload.get("products", []) if isinstance(payload, dict) else payload
+    products = []
+    for item in items or []:
+        if not isinstance(item, dict):
+            continue
+        pid, name = item.get("id"), item.get("name")
+        if pid is None or not name:
+            continue
+        products.append({"id": str(pid), "name": str(name).strip()})
+    return products
+
+
+def fetch_products(get_page: Callable[[Dict[str, int]], object]) -> List[dict]:
+    """Page through the product list; get_page({"page", "limit"}) returns the decoded JSON."""
+    products = []
+    for page_no in range(1, 1000):
+        batch = _parse_products(get_page({"page": page_no, "limit": PAGE_SIZE}))
+        products.extend(batch)
+        if len(batch) < PAGE_SIZE:
+            break
+    return products
+
+
+def browser_fetcher(context, base_url: str = DEFAULT_BASE_URL):
+    """get_page() for fetch_products() using a logged-in Playwright context (shares its cookies)."""
+    url = base_url.rstrip("/") + ENDPOINTS["products"]
+
+    def get_page(params):
+        resp = context.request.get(url, params=params, headers={"Accept": "application/json"}, timeout=30000)
+        if not resp.ok:
+            raise KountaAPIError(f"GET {ENDPOINTS['products']} → HTTP {resp.status}", status=resp.status)
+        return resp.json()
+
+    return get_page
+
+
+def api_fetcher(api: KountaPurchaseAPI):
+    """get_page() for fetch_products() using the cookie-based API client."""
+    return api.list_products
+
+
+def index_path_for(base_url: str) -> str:
+    """One cache per host, so a run against the local stub never pollutes the real index."""
+    host = urllib.parse.urlparse(base_url).netloc or "default"
+    return os.path.join(INDEX_DIR, re.sub(r"[^A-Za-z0-9_.-]", "_", host) + ".json")
+
+
+def _read_cache(path: str) -> Optional[ProductIndex]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return ProductIndex(data["products"], data.get("fetched_at", 0.0))
+    except (FileNotFoundError, ValueError, KeyError):
+        return None
+
+
+def _write_cache(path: str, index: ProductIndex):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"fetched_at": index.fetched_at, "products": index.products}, f)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"⚠️ Could not write product index: {e}")
+
+
+def load_index(get_page=None, refresh: bool = False, base_url: str = DEFAULT_BASE_URL,
+               path: Optional[str] = None, max_age: float = MAX_AGE_SECONDS) -> ProductIndex:
+    """
+    Cached index for 'base_url' if it is fresh enough, otherwise fetch it with get_page (if given).
+    A failed fetch falls back to the stale cache, or to an empty index.
+    """
+    path = path or index_path_for(base_url)
+    cached = _read_cache(path)
+    if cached is not None and not refresh and time.time() - cached.fetched_at < max_age:
+        print(f"🗂️ Product index: {len(cached)} products (cached)")
+        return cached
+    if get_page is None:
+        return cached or ProductIndex([])
+
+    start = time.perf_counter()
+    try:
+        products = fetch_products(get_page)
+    except Exception as e:
+        print(f"⚠️ Could not fetch the product list ({e}); using per-line search")
+        return cached or ProductIndex([])
+    if not products:
+        print("⚠️ Product list came back empty; using per-line search")
+        return cached or ProductIndex([])
+
+    index = ProductIndex(products, time.time())
+    _write_cache(path, index)
+    print(f"🗂️ Product index: {len(index)} products fetched in {time.perf_counter() - start:.1f}s")
+    return index
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Lightspeed product index used by the upload bots")
+    parser.add_argument("--index", default=None, help="Ruta del índice (default: .cache/product_index/<host>.json)")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_refresh = sub.add_parser("refresh", help="Volver a bajar la lista de productos (usa lightspeed_cookies.json)")
+    p_refresh.add_argument("--api-url", default=None, help="Base URL (default: KOUNTA_PURCHASE_API o purchase.kounta.com)")
+    p_show = sub.add_parser("show", help="Buscar un nombre en el índice")
+    p_show.add_argument("name")
+    args = parser.parse_args()
+
+    if args.cmd == "refresh":
+        try:
+            api = KountaPurchaseAPI(args.api_url)
+        except KountaAPIError as e:
+            print(f"❌ {e}")
+            return
+        load_index(api_fetcher(api), refresh=True, base_url=api.base_url, path=args.index)
+    elif args.cmd == "show":
+        index = load_index(path=args.index, max_age=float("inf"))
+        hit = index.get(args.name)
+        print(f"✅ {hit['name']} → id {hit['id']}" if hit else f"⚠️ '{args.name}' not in the index ({len(index)} products)")
+
+
+if __name__ == "__main__":
+    main_cli()
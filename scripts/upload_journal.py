@@ -0,0 +1,208 @@
+"""
+Write-ahead journal for 4-upload.py (.cache/upload_journal.sqlite).
+
+One record per invoice (PO) and one per line (product, qty, cost, status), written
+BEFORE each step in the browser and confirmed after it:
+
+- order: 'new' → 'open' (PO created/opened, pre-loaded line removed, PO number known) → 'done'
+- line:  'pending' → 'adding' (about to be added) → 'done' (quantity and total price applied)
+
+If a run dies halfway through a PO, the next run reopens the same PO, skips the lines
+already 'done' and resumes at the first missing one. A line left in 'adding' is looked up
+in the PO first, so it is never added twice.
+
+Invoices are keyed by their content (PO number, codes, quantities, costs), so a
+re-parsed Excel of the same invoice resumes too. Invoices without a PO (PO00000000)
+also carry their Excel file name: a standing order with the same lines every week
+is a new invoice each time, not one already uploaded.
+
+Usage (from the project root):
+    python scripts/upload_journal.py list
+    python scripts/upload_journal.py show <order_key>
+    python scripts/upload_journal.py forget <order_key>      # next run starts that invoice from scratch
+"""
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPTS_DIR, ".."))
+DEFAULT_DB_PATH = os.path.join(PROJECT_ROOT, ".cache", "upload_journal.sqlite")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    order_key  TEXT PRIMARY KEY,
+    file       TEXT,
+    supplier   TEXT,
+    po_number  TEXT,
+    status     TEXT NOT NULL DEFAULT 'new',
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS lines (
+    order_key    TEXT NOT NULL,
+    line_no      INTEGER NOT NULL,
+    product_code TEXT,
+    product_name TEXT NOT NULL,
+    quantity     INTEGER NOT NULL,
+    total_cost   REAL NOT NULL,
+    status       TEXT NOT NULL DEFAULT 'pending',
+    updated_at   TEXT NOT NULL,
+    PRIMARY KEY (order_key, line_no)
+);
+"""
+
+
+def order_key_for(lines: Iterable[Tuple[str, str, int, float]], po_number: str = "", file: str = "") -> str:
+    """
+    Content key of an invoice: PO number + (code, name, qty, cost) of every line.
+    'file' (the invoice's Excel name) is only part of the key when there is no PO number.
+    """
+    po_number = str(po_number).strip()
+    h = hashlib.sha1(po_number.encode("utf-8"))
+    if not po_number or po_number == "PO00000000":
+        h.update(f"|{os.path.basename(str(file or ''))}".encode("utf-8"))
+    for code, name, qty, cost in lines:
+        h.update(f"|{code}|{name}|{int(qty)}|{float(cost):.2f}".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+class UploadJournal:
+    """SQLite journal shared by the upload worker threads (one connection, one lock)."""
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or DEFAULT_DB_PATH
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.executescript(_SCHEMA)
+        self.conn.commit()
+        self.lock = threading.Lock()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @staticmethod
+    def _now():
+        return datetime.now().isoformat(timespec="seconds")
+
+    def start_order(self, order_key: str, file: str, supplier: str, lines: Iterable[Tuple[str, str, int, float]]) -> dict:
+        """Register an invoice and its lines (no-op if already journaled). Returns order_state()."""
+        now = self._now()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO orders (order_key, file, supplier, status, updated_at) VALUES (?, ?, ?, 'new', ?)",
+                (order_key, file, supplier, now),
+            )
+            self.conn.executemany(
+                """
+                INSERT OR IGNORE INTO lines (order_key, line_no, product_code, product_name, quantity, total_cost, status, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, 'pending', ?)
+                """,
+                [(order_key, i, code, name, int(qty), float(cost), now) for i, (code, name, qty, cost) in enumerate(lines)],
+            )
+            self.conn.commit()
+        return self.order_state(order_key)
+
+    def order_state(self, order_key: str) -> Optional[dict]:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT status, po_number, file FROM orders WHERE order_key = ?", (order_key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"status": row[0], "po_number": row[1], "file": row[2]}
+
+    def open_order(self, order_key: str, po_number: str):
+        """The PO exists in Lightspeed (created or opened and cleaned): remember its number."""
+        with self.lock:
+            self.conn.execute(
+                "UPDATE orders SET status = 'open', po_number = ?, updated_at = ? WHERE order_key = ? AND status != 'done'",
+                (str(po_number), self._now(), order_key),
+            )
+            self.conn.commit()
+
+    def finish_order(self, order_key: str) -> int:
+        """Mark the invoice done if every line is confirmed; returns how many lines are still missing."""
+        with self.lock:
+            missing = self.conn.execute(
+                "SELECT COUNT(*) FROM lines WHERE order_key = ? AND status != 'done'", (order_key,)
+            ).fetchone()[0]
+            if not missing:
+                self.conn.execute(
+                    "UPDATE orders SET status = 'done', updated_at = ? WHERE order_key = ?", (self._now(), order_key)
+                )
+                self.conn.commit()
+        return missing
+
+    def line_status(self, order_key: str) -> Dict[int, str]:
+        with self.lock:
+            return dict(self.conn.execute("SELECT line_no, status FROM lines WHERE order_key = ?", (order_key,)))
+
+    def mark_line(self, order_key: str, line_no: int, status: str):
+        with self.lock:
+            self.conn.execute(
+                "UPDATE lines SET status = ?, updated_at = ? WHERE order_key = ? AND line_no = ?",
+                (status, self._now(), order_key, int(line_no)),
+            )
+            self.conn.commit()
+
+    def forget(self, order_key: str) -> bool:
+        with self.lock:
+            cur = self.conn.execute("DELETE FROM orders WHERE order_key = ?", (order_key,))
+            self.conn.execute("DELETE FROM lines WHERE order_key = ?", (order_key,))
+            self.conn.commit()
+        return cur.rowcount > 0
+
+    def orders(self):
+        with self.lock:
+            return self.conn.execute(
+                """
+                SELECT o.order_key, o.file, o.supplier, o.po_number, o.status, o.updated_at,
+                       SUM(l.status = 'done'), COUNT(l.line_no)
+                FROM orders o LEFT JOIN lines l ON l.order_key = o.order_key
+                GROUP BY o.order_key ORDER BY o.updated_at DESC
+                """
+            ).fetchall()
+
+    def lines(self, order_key: str):
+        with self.lock:
+            return self.conn.execute(
+                "SELECT line_no, product_name, quantity, total_cost, status FROM lines WHERE order_key = ? ORDER BY line_no",
+                (order_key,),
+            ).fetchall()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Inspect the 4-upload.py resume journal")
+    parser.add_argument("--db", default=None, help="Ruta a la base SQLite (default: .cache/upload_journal.sqlite)")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("list", help="Facturas registradas y su avance")
+    p_show = sub.add_parser("show", help="Líneas de una factura")
+    p_show.add_argument("order_key")
+    p_forget = sub.add_parser("forget", help="Borrar una factura del journal")
+    p_forget.add_argument("order_key")
+    args = parser.parse_args()
+
+    with UploadJournal(args.db) as journal:
+        if args.cmd == "list":
+            for key, file, supplier, po, status, updated, done, total in journal.orders():
+                print(f"{key}  {file}  [{supplier}] PO {po or '-'}  {status}  {done or 0}/{total} lines  ({updated})")
+        elif args.cmd == "show":
+            for line_no, name, qty, cost, status in journal.lines(args.order_key):
+                print(f"{line_no:>3}  {status:<8} {qty:>4} x {name}  ${cost:,.2f}")
+        elif args.cmd == "forget":
+            print(f"🗑️ Forgot {args.order_key}" if journal.forget(args.order_key) else f"⚠️ No journal entry for {args.order_key}")
+
+
+if __name__ == "__main__":
+    main_cli()